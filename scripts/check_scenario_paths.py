@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Check of flow-path blending in scenario matrices against simulateSinglePorosityMultiFracture.
+
+    python scripts/check_scenario_paths.py [--recRatio 0.3] [--wsCoef 0.2] [--atol 1e-9]
+
+Two flow paths blended with paths=("path", recoveries) in simulateScenarioMatrix, over a
+frac_retard dimension and two injection schedules, must reproduce the multi-fracture model
+with recirculation; ScenarioResult.mix must refuse curves with recirculation.
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src.scenario_options import simulateScenarioMatrix
+from src.simulation_options import simulateSinglePorosityMultiFracture
+
+MEAN_RESIDENCE_TIMES = [6.0, 18.0]
+PECLET_NUMBERS = [12.0, 40.0]
+FRACTIONAL_RECOVERIES = [0.35, 0.45]
+FRAC_RETARDS = [1.0, 1.6, 2.5]
+SCHEDULES = {'T=1.5': ([7.0, 0], [1.5]), 'T=3.0': ([5.0, 0], [3.0])}
+
+
+def check(recRatio=0.3, wsCoef=0.2, atol=1e-9):
+    time_points = np.linspace(0.5, 80, 120)
+    bckgrnd_conc = 0.05
+    failures = []
+
+    result = simulateScenarioMatrix(
+        {'frac_retard': FRAC_RETARDS,
+         'path': {'mean_residence_time': MEAN_RESIDENCE_TIMES, 'peclet_number': PECLET_NUMBERS}},
+        SCHEDULES, time_points, bckgrnd_conc, chunk_size=3,
+        paths=('path', FRACTIONAL_RECOVERIES), recRatio=recRatio, wsCoef=wsCoef)
+    if result.dims != ('frac_retard', 'schedule', 'time'):
+        failures.append(f'unexpected dims {result.dims}')
+
+    for frac_retard in FRAC_RETARDS:
+        for label, (inj_concs, inj_durs) in SCHEDULES.items():
+            expected = simulateSinglePorosityMultiFracture(
+                MEAN_RESIDENCE_TIMES, PECLET_NUMBERS, FRACTIONAL_RECOVERIES, frac_retard, time_points,
+                bckgrnd_conc, np.asarray(inj_concs, dtype=float), np.asarray(inj_durs, dtype=float),
+                recRatio=recRatio, wsCoef=wsCoef, closed_form=False)
+            error = np.max(np.abs(result.sel(frac_retard=frac_retard, schedule=label).values - expected))
+            print(f'frac_retard={frac_retard:g} schedule={label}: max abs error {error:.1e}')
+            if error > atol:
+                failures.append(f'frac_retard={frac_retard:g} schedule={label}: error {error:.1e} > {atol:g}')
+
+    unblended = simulateScenarioMatrix(
+        {'path': {'mean_residence_time': MEAN_RESIDENCE_TIMES, 'peclet_number': PECLET_NUMBERS}},
+        SCHEDULES, time_points, bckgrnd_conc, frac_retard=1.0, recRatio=recRatio, wsCoef=wsCoef)
+    try:
+        unblended.mix('path', FRACTIONAL_RECOVERIES, bckgrnd_conc)
+        if recRatio != 0:
+            failures.append('mix accepted curves with recirculation')
+    except ValueError:
+        if recRatio == 0:
+            failures.append('mix rejected curves without recirculation')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recRatio', type=float, default=0.3, help='recirculation ratio')
+    parser.add_argument('--wsCoef', type=float, default=0.2, help='wellbore storage coefficient')
+    parser.add_argument('--atol', type=float, default=1e-9, help='largest accepted absolute error')
+    args = parser.parse_args()
+
+    failures = check(args.recRatio, args.wsCoef, args.atol)
+    for failure in failures:
+        print('FAILED:', failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Local check of the shared-filesystem sweep queue (src/sweep_queue.py).
+
+    python scripts/check_sweep_queue.py [--workers 4] [--samples 512] [--chunk-size 32] [--lease 2]
+
+Queues a small two-fracture sweep in a temporary directory and drains it with several
+independent worker processes. One extra worker claims a chunk and is killed mid-chunk, so
+its lease must expire and be taken over. The merged table must equal run_sweep on the same
+config, with every iteration exactly once.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from src.sweep_queue import init_queue, claim_chunk, run_worker, merge_queue, queue_status, _shard_path
+from src.sweep_runner import run_sweep
+
+CONFIG_FILE = os.path.join(ROOT, 'configs', 'single_porosity_two_fracture.json')
+
+
+def _stalled_worker(path, lease_seconds, claimed):
+    # claims a chunk and never finishes it; the harness kills this process mid-chunk
+    chunk_id, lease = claim_chunk(path, 'stalled', lease_seconds)
+    claimed.put(chunk_id)
+    time.sleep(3600)
+
+
+def check(n_workers=4, n_samples=512, chunk_size=32, lease_seconds=2.0):
+    with open(CONFIG_FILE) as f:
+        config = json.load(f)
+    config.update(n_samples=n_samples, chunk_size=chunk_size, seed=0)
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = os.path.join(tmp, 'queue')
+        init_queue(config, queue)
+
+        claimed = context.Queue()
+        stalled = context.Process(target=_stalled_worker, args=(queue, lease_seconds, claimed))
+        stalled.start()
+        stalled_chunk = claimed.get(timeout=60)
+
+        start = time.time()
+        workers = [
+            context.Process(target=run_worker, args=(queue, f'worker-{i}', lease_seconds),
+                            kwargs={'poll_seconds': lease_seconds / 4})
+            for i in range(n_workers)]
+        for worker in workers:
+            worker.start()
+        time.sleep(lease_seconds / 2)
+        stalled.kill()
+        stalled.join()
+        for worker in workers:
+            worker.join()
+        elapsed = time.time() - start
+
+        failures = [f'worker-{i} exited with {w.exitcode}' for i, w in enumerate(workers) if w.exitcode != 0]
+        status = queue_status(queue)
+        if status['done'] != status['chunks']:
+            failures.append(f'queue not drained: {status}')
+        if not os.path.exists(_shard_path(queue, stalled_chunk)):
+            failures.append(f'chunk {stalled_chunk} of the killed worker was not taken over')
+
+        merged = merge_queue(queue, os.path.join(tmp, 'merged'))
+        if not merged['iteration'].is_unique:
+            failures.append('merged table has duplicate iterations')
+        reference = run_sweep(config, os.path.join(tmp, 'reference'), backend='thread')
+        if merged.shape != reference.shape or not np.array_equal(merged.to_numpy(), reference.to_numpy()):
+            failures.append('merged table differs from run_sweep')
+
+    print(f"{n_workers} workers drained {status['chunks']} chunks in {elapsed:.1f} s; "
+          f"chunk {stalled_chunk} was taken over from the killed worker")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='worker processes')
+    parser.add_argument('--samples', type=int, default=512, help='samples in the test sweep')
+    parser.add_argument('--chunk-size', type=int, default=32, help='samples per chunk')
+    parser.add_argument('--lease', type=float, default=2.0, help='lease lifetime in seconds')
+    args = parser.parse_args()
+
+    failures = check(args.workers, args.samples, args.chunk_size, args.lease)
+    for failure in failures:
+        print('FAILED:', failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
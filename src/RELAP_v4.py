@@ -1,6 +1,31 @@
+import time
 import numpy as np
-from mpmath import *
-mp.dps = 8; mp.pretty = True
+import mpmath as mpm
+from . import instrumentation_options as _instrumentation
+from .inversion_algorithms import invert_laplace, invert_laplace_mpmath, invert_laplace_adaptive
+
+# Every node evaluates either a single mpmath value of s (reference path used by
+# mpmath.invertlaplace) or a whole complex128 numpy array of s in one broadcasted
+# pass (used by the vectorized inversion engine). _math picks the matching namespace;
+# mpmath values carry their own context, so the precision is the caller's, never global.
+def _math(s):
+  if isinstance(s, (np.ndarray, np.generic)):
+    return np
+  return getattr(s, 'context', mpm.mp)
+
+# Kernel pieces safe in float64/complex128. The groundwater exponent Pe/2*(1 - sqrt(1 + 4t/Pe*q))
+# is evaluated as -2t*q / (1 + sqrt(1 + 4t/Pe*q)): same value, but without the cancellation in
+# 1 - sqrt(...) that loses every digit at large Peclet numbers and small |s| (and Pe = inf gives
+# plug flow). tanh is built from expm1(-2|z|), so it never overflows and stays accurate near 0.
+def _advection_dispersion(xp, t, Pe, q):
+  return xp.exp( -2 * t * q / ( 1 + xp.sqrt( 1 + 4 * t / Pe * q ) ) )
+
+def _tanh(xp, z):
+  if xp is not np:
+    return xp.tanh(z)
+  sign = np.where(np.real(z) < 0, -1, 1)
+  e = np.expm1(-2 * sign * z)
+  return sign * (-e / (2 + e))
 
 # Dual Porosity Finite Matrix
 class GroundWaterFiniteMatrixSolution:
@@ -28,14 +53,12 @@ class GroundWaterFiniteMatrixSolution:
     dP = self.dualPorosity_param
     abDm = self.abDm
     k = self.thermal_degradation_coeff
+    xp = _math(s)
 
-    term1 = tanh( sqrt( Rm * ( s + k ) ) * abDm )
-    term2 = Rf * ( s + k ) + dP * sqrt( Rm * ( s + k ) ) * term1
-    term3 = 4 * t / Pe * term2
-    term4 = sqrt( 1 + term3 )
-    term5 = exp( Pe/2 * ( 1 - term4 ))
+    term1 = _tanh( xp, xp.sqrt( Rm * ( s + k ) ) * abDm )
+    term2 = Rf * ( s + k ) + dP * xp.sqrt( Rm * ( s + k ) ) * term1
 
-    return term5
+    return _advection_dispersion( xp, t, Pe, term2 )
 
 class GroundWaterFiniteMatrixSolution_2:
   def __init__(self,
@@ -65,14 +88,12 @@ class GroundWaterFiniteMatrixSolution_2:
     x2 = self.porosity_ratio
     x3 = self.water_ratio
     k = self.thermal_degradation_coeff
+    xp = _math(s)
 
-    term1 = tanh( sqrt( Rm * ( s + k ) ) * (1/x1) * ( 1/2 * x3 - 1 ) )
-    term2 = Rf * ( s + k ) + x2 * x1 * sqrt( Rm * ( s + k ) ) * term1
-    term3 = 4 * t / Pe * term2
-    term4 = sqrt( 1 + term3 )
-    term5 = exp( Pe/2 * ( 1 - term4 ))
+    term1 = _tanh( xp, xp.sqrt( Rm * ( s + k ) ) * (1/x1) * ( 1/2 * x3 - 1 ) )
+    term2 = Rf * ( s + k ) + x2 * x1 * xp.sqrt( Rm * ( s + k ) ) * term1
 
-    return term5
+    return _advection_dispersion( xp, t, Pe, term2 )
 
 
 # Dual Porosity Infinite Matrix
@@ -99,13 +120,50 @@ class GroundWaterInfiniteMatrixSolution:
     t = self.mean_residence_time
     k = self.thermal_degradation_coeff
     dP = self.dualPorosity_param
+    xp = _math(s)
 
-    term2 = Rf * ( s + k ) + dP * sqrt( Rm * ( s + k ) )
-    term3 = 4 * t / Pe * term2
-    term4 = sqrt( 1 + term3 )
-    term5 = exp( Pe/2 * ( 1 - term4 ))
+    term2 = Rf * ( s + k ) + dP * xp.sqrt( Rm * ( s + k ) )
 
-    return term5
+    return _advection_dispersion( xp, t, Pe, term2 )
+
+  def log_derivatives(self, s):
+    # Laplace-domain sensitivities: d log(G) / d parameter, broadcast like __call__.
+    # dG/dp = G * log_derivatives(s)[p]
+    Rf = self.fracture_retardation
+    Rm = self.matrix_retardation
+    Pe = self.peclet_number
+    t = self.mean_residence_time
+    k = self.thermal_degradation_coeff
+    dP = self.dualPorosity_param
+    xp = _math(s)
+
+    matrix_term = xp.sqrt( Rm * ( s + k ) )
+    term2 = Rf * ( s + k ) + dP * matrix_term
+    term4 = xp.sqrt( 1 + 4 * t / Pe * term2 )
+
+    return {
+      'mean_residence_time': -term2 / term4,
+      'peclet_number': ( 1 - term4 ) / 2 + t * term2 / ( Pe * term4 ),
+      'fracture_retardation': -t * ( s + k ) / term4,
+      'matrix_retardation': -t * dP * matrix_term / ( 2 * Rm * term4 ),
+      'dualPorosity_param': -t * matrix_term / term4,
+    }
+
+# Several flow paths (fractures) in parallel between the injector and the producer.
+# The weighted sum of their transfer functions is a single groundwater node, so the
+# mixture is inverted once and can share one recirculation / wellbore loop.
+class FractureMixture:
+  def __init__(self, Ground_Waters, fractional_recoveries):
+    if len(Ground_Waters) != len(fractional_recoveries):
+      raise ValueError("Need one fractional recovery per flow path.")
+    self.Ground_Waters = Ground_Waters
+    self.fractional_recoveries = fractional_recoveries
+
+  def __call__(self, s):
+    mixture = 0
+    for ground_water, fractional_recovery in zip(self.Ground_Waters, self.fractional_recoveries):
+      mixture = mixture + fractional_recovery * ground_water(s)
+    return mixture
 
 # Input tracers is a series of pulses
 class Input_Pulses_of_Tracer:
@@ -126,14 +184,15 @@ class Input_Pulses_of_Tracer:
     def __call__(self,s):
       C_R = self.relative_concentrations
       T_p = self.injection_durations
+      xp = _math(s)
 
-      first_slug = C_R[0] * ( 1 - exp( -s * T_p[0] ) ) / s
-      displacing_water = C_R[-1] * exp( -s * T_p[-1] ) / s
+      first_slug = C_R[0] * ( 1 - xp.exp( -s * T_p[0] ) ) / s
+      displacing_water = C_R[-1] * xp.exp( -s * T_p[-1] ) / s
 
       if len(self.injection_concentrations) >2:
           subsequent_slugs = 0
           for i in range(1, self.num_slugs):
-              subsequent_slugs = subsequent_slugs + C_R[i] * ( exp( -s * T_p[i-1] ) - exp( -s * T_p[i] ) ) / s
+              subsequent_slugs = subsequent_slugs + C_R[i] * ( xp.exp( -s * T_p[i-1] ) - xp.exp( -s * T_p[i] ) ) / s
 
 
           slugs_superposition = first_slug + subsequent_slugs + displacing_water
@@ -159,14 +218,22 @@ class Tracer_Injection_with_Background_Concentration:
         C_0D = self.dimensionless_background_concentration
         T_p = self.injection_duration
 
-        input_function = ( 1 - ( 1 - C_0D ) * exp( -s * T_p ) ) / s
+        input_function = ( 1 - ( 1 - C_0D ) * _math(s).exp( -s * T_p ) ) / s
         return input_function
 
+# Identity node - default for the optional wellbore storage and pipeline delay nodes
+class Identity:
+  def __call__(self, s):
+    return 1
+
 # Wellbore storage node
 class WellboreStorage:
   def __init__(self, wellbore_storage_coeff):
     self.wellbore_storage_coeff = wellbore_storage_coeff
   def __call__(self, s):
+    if isinstance(self.wellbore_storage_coeff, np.ndarray):
+      # batched coefficients: a zero coefficient means no wellbore storage for that parameter set
+      return np.where(self.wellbore_storage_coeff > 0, self.wellbore_storage_coeff / ( self.wellbore_storage_coeff + s ), 1)
     return self.wellbore_storage_coeff / ( self.wellbore_storage_coeff + s )
 
 # Pipeline delay node
@@ -175,7 +242,7 @@ class PipelineDelay:
     self.delay_time = delay_time
 
   def __call__(self, s):
-    return exp(-1 * self.delay_time * s)
+    return _math(s).exp(-1 * self.delay_time * s)
 
 # Tracer recirculation into the injection well
 class Recirculation:
@@ -189,8 +256,8 @@ class RELAP_Modifed:
     def __init__(self,
                  Ground_Water,
                  Input_Instance,
-                 wellbore_storage_node = lambda s: 1,
-                 pipeline_delay_node = lambda s: 1,
+                 wellbore_storage_node = Identity(),
+                 pipeline_delay_node = Identity(),
                  recirculation=False):
 
         self.Ground_Water = Ground_Water # instance of one of the groundwater solutions
@@ -199,36 +266,95 @@ class RELAP_Modifed:
         self.pipeline_delay_node = pipeline_delay_node
         self.recirculation = recirculation
 
+        # nodes multiplied into the loop, resolved once instead of on every evaluation
+        self.loop_nodes = [node for node in (self.Ground_Water, self.pipeline_delay_node, self.wellbore_storage_node)
+                           if not isinstance(node, Identity)]
+
     def __call__(self, s):
-        loop_solution = self.Ground_Water(s) * self.pipeline_delay_node(s) * self.wellbore_storage_node(s)
+        if _instrumentation.state.enabled:
+            return self._instrumented_call(s)
+        # s may be a single value or a numpy array of abscissae
+        loop_solution = self.loop_nodes[0](s)
+        for node in self.loop_nodes[1:]:
+            loop_solution = loop_solution * node(s)
         if self.recirculation:
             loop_solution = self.recirculation(loop_solution)
         full_solution = loop_solution * self.Input_Instance(s)
 
         return full_solution
 
+    def _instrumented_call(self, s):
+        # same evaluation as __call__, recording calls, time and evaluations per node
+        def timed(node, argument):
+            start = time.perf_counter()
+            value = node(argument)
+            name = type(getattr(node, 'node', node)).__name__  # cached input nodes by the wrapped class
+            _instrumentation.record(f'node.{name}', time.perf_counter() - start, evaluations=np.size(value))
+            return value
+
+        start = time.perf_counter()
+        loop_solution = timed(self.loop_nodes[0], s)
+        for node in self.loop_nodes[1:]:
+            loop_solution = loop_solution * timed(node, s)
+        if self.recirculation:
+            loop_solution = timed(self.recirculation, loop_solution)
+        full_solution = loop_solution * timed(self.Input_Instance, s)
+        _instrumentation.record('network', time.perf_counter() - start, evaluations=np.size(full_solution))
+
+        return full_solution
+
+def _invert_RELAP(RELAP_instance, time_points, method, order, engine, plan=None, dps=8, return_error=False):
+    # engine='adaptive' estimates the error at every time point and adds precision only where needed
+    if engine == 'adaptive':
+        values, error, _ = invert_laplace_adaptive(RELAP_instance, time_points, method=method, order=order)
+        return (values, error) if return_error else values
+    if return_error:
+        raise ValueError("Error estimates are only available with engine='adaptive'.")
+    if engine == 'mpmath':
+        return invert_laplace_mpmath(RELAP_instance, time_points, method=method, dps=dps)
+    elif engine == 'numpy':
+        return invert_laplace(RELAP_instance, time_points, method=method, order=order, plan=plan)
+    else:
+        raise ValueError(f"Unknown inversion engine '{engine}'. Choose 'numpy', 'mpmath' or 'adaptive'.")
+
 def Simulate_RELAP_Dimensionless(
         RELAP_instance,
         time_points,
         injection_concentration,
         background_concentration,
-        normalize=False):
-
-    dimensionless_concentration = [invertlaplace(RELAP_instance, time_point, method='dehoog') for time_point in time_points]
-    dimensionless_concentration = np.array(dimensionless_concentration)
+        normalize=False,
+        method='dehoog',
+        order=None,
+        engine='numpy',
+        plan=None,
+        dps=8,
+        return_error=False):
+
+    dimensionless_concentration = _invert_RELAP(RELAP_instance, time_points, method, order, engine, plan, dps, return_error)
+    if return_error:
+        dimensionless_concentration, error = dimensionless_concentration
     if normalize:
-        return dimensionless_concentration
+        return (dimensionless_concentration, error) if return_error else dimensionless_concentration
     else:
-        dimensional_concentration = background_concentration + (injection_concentration - background_concentration) * dimensionless_concentration
-        return dimensional_concentration
+        scale = injection_concentration - background_concentration
+        dimensional_concentration = background_concentration + scale * dimensionless_concentration
+        return (dimensional_concentration, abs(scale) * error) if return_error else dimensional_concentration
 
 
 def Simulate_RELAP_Relative(
         RELAP_instance,
         time_points,
-        background_concentration):
-  relative_concentration = [invertlaplace(RELAP_instance, time_point, method='dehoog') for time_point in time_points]
-  relative_concentration = np.array(relative_concentration, dtype=np.float64)
+        background_concentration,
+        method='dehoog',
+        order=None,
+        engine='numpy',
+        plan=None,
+        dps=8,
+        return_error=False):
+  relative_concentration = _invert_RELAP(RELAP_instance, time_points, method, order, engine, plan, dps, return_error)
+  if return_error:
+    relative_concentration, error = relative_concentration
+    return background_concentration + relative_concentration, error
   absolute_concentration = background_concentration + relative_concentration
 
   return absolute_concentration
\ No newline at end of file
@@ -0,0 +1,463 @@
+import numpy as np
+from scipy.special import erfcx, gamma, rgamma
+
+from .inversion_algorithms import get_inversion_plan, invert_laplace, _LRUCache
+
+
+# Small-s (long-time) and large-s (early-time) expansions of RELAP networks.
+#
+# Nodes take their math namespace from s (see RELAP_v4._math), so evaluating a network
+# on a truncated series object instead of an array yields the series of the whole
+# transform - groundwater kernel, input pulses, recirculation, wellbore storage and
+# pipeline delay alike - without any node-specific code.
+#
+# Small s: a Laurent series in u = sqrt(s). Integer powers of s are analytic at s = 0 and
+# only contribute at t = 0; the half-integer powers (matrix diffusion, sqrt(Rm*s)) give the
+# algebraic late-time tail  L^-1[s^(m/2)] = t^(-m/2-1) / Gamma(-m/2),  and a 1/s term gives
+# the final plateau. Finite-matrix kernels are analytic at s = 0, so their tails decay
+# exponentially and are left to the numerical inversion.
+#
+# Large s: a sum of exp(-d*s - a*sqrt(s)) factors, each times a Laurent series in
+# v = 1/sqrt(s), inverted term by term with repeated erfc integrals.
+
+SERIES_ORDER = 16           # series kept up to (but excluding) u**16 or v**16
+GEOMETRIC_TERMS = 4         # passes kept when expanding 1/(1 + eps) and tanh at large s
+SERIES_CACHE_SIZE = 256     # expansions kept per parameter set (see invert_with_asymptotics)
+
+
+class _Series:
+    """
+    Truncated Laurent series  sum_k coeffs[k] * x**(valuation + k) + O(x**order).
+    """
+    __array_ufunc__ = None  # numpy scalars defer to the reflected operators below
+
+    def __init__(self, coeffs, valuation, order):
+        n = max(order - valuation, 0)
+        coeffs = np.asarray(coeffs, dtype=np.float64)[:n]
+        # known coefficients run up to the order; absent ones are exact zeros
+        coeffs = np.concatenate([coeffs, np.zeros(n - len(coeffs))])
+        nonzero = np.flatnonzero(coeffs)
+        if len(nonzero) == 0:
+            self.coeffs, self.valuation = np.zeros(0), order
+        else:
+            self.coeffs, self.valuation = coeffs[nonzero[0]:], valuation + int(nonzero[0])
+        self.order = order
+
+    def _coerce(self, other):
+        if isinstance(other, _Series):
+            return other
+        return _Series([other], 0, self.order)
+
+    def coefficient(self, power):
+        k = power - self.valuation
+        return self.coeffs[k] if 0 <= k < len(self.coeffs) else 0.0
+
+    def __add__(self, other):
+        other = self._coerce(other)
+        valuation = min(self.valuation, other.valuation)
+        order = min(self.order, other.order)
+        coeffs = np.zeros(max(order - valuation, 0))
+        for series in (self, other):
+            n = min(len(series.coeffs), len(coeffs) - (series.valuation - valuation))
+            if n > 0:
+                coeffs[series.valuation - valuation:series.valuation - valuation + n] += series.coeffs[:n]
+        return _Series(coeffs, valuation, order)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return _Series(-self.coeffs, self.valuation, self.order)
+
+    def __sub__(self, other):
+        return self + (-self._coerce(other))
+
+    def __rsub__(self, other):
+        return self._coerce(other) - self
+
+    def __mul__(self, other):
+        if not isinstance(other, _Series):
+            return _Series(self.coeffs * other, self.valuation, self.order) if other != 0 else _Series([], 0, self.order)
+        valuation = self.valuation + other.valuation
+        order = min(self.valuation + other.order, other.valuation + self.order)
+        if len(self.coeffs) == 0 or len(other.coeffs) == 0:
+            return _Series([], valuation, order)
+        return _Series(np.convolve(self.coeffs, other.coeffs), valuation, order)
+
+    __rmul__ = __mul__
+
+    def reciprocal(self):
+        if len(self.coeffs) == 0:
+            raise ZeroDivisionError("Series is zero to the retained order.")
+        b = self.coeffs
+        n = len(b)
+        inverse = np.zeros(n)
+        inverse[0] = 1 / b[0]
+        for k in range(1, n):
+            inverse[k] = -np.dot(b[1:k + 1], inverse[k - 1::-1]) / b[0]
+        return _Series(inverse, -self.valuation, -self.valuation + n)
+
+    def __truediv__(self, other):
+        if not isinstance(other, _Series):
+            return self * (1 / other)
+        return self * other.reciprocal()
+
+    def __rtruediv__(self, other):
+        return self.reciprocal() * other
+
+    def exp(self):
+        if self.valuation < 0:
+            raise ValueError("exp of a series with negative powers")
+        n = self.order
+        f = np.zeros(n)
+        f[self.valuation:self.valuation + len(self.coeffs)] = self.coeffs[:n - self.valuation]
+        e = np.zeros(n)
+        e[0] = np.exp(f[0])
+        k = np.arange(n)
+        for m in range(1, n):
+            e[m] = np.dot(k[1:m + 1] * f[1:m + 1], e[m - 1::-1]) / m
+        return _Series(e, 0, n)
+
+    def sqrt(self):
+        if len(self.coeffs) == 0:
+            return _Series([], self.order // 2, self.order // 2)
+        if self.valuation % 2 or self.coeffs[0] < 0:
+            raise ValueError("sqrt of a series needs an even valuation and a positive leading coefficient")
+        g = self.coeffs
+        n = len(g)
+        r = np.zeros(n)
+        r[0] = np.sqrt(g[0])
+        for m in range(1, n):
+            r[m] = (g[m] - np.dot(r[1:m], r[m - 1:0:-1])) / (2 * r[0])
+        return _Series(r, self.valuation // 2, self.valuation // 2 + n)
+
+    def tanh(self):
+        e = (2 * self).exp()
+        return (e - 1) / (e + 1)
+
+
+class _LargeS:
+    """
+    sum over (d, a) of exp(-d*s - a*sqrt(s)) * series in v = 1/sqrt(s).
+    """
+    __array_ufunc__ = None
+
+    def __init__(self, terms, order):
+        self.terms = {key: series for key, series in terms.items() if len(series.coeffs)}
+        self.order = order
+
+    @staticmethod
+    def _key(d, a):
+        return (round(float(d), 12) + 0.0, round(float(a), 12) + 0.0)
+
+    def _coerce(self, other):
+        if isinstance(other, _LargeS):
+            return other
+        return _LargeS({(0.0, 0.0): _Series([other], 0, self.order)}, self.order)
+
+    def _single(self):
+        if len(self.terms) != 1:
+            raise NotImplementedError("Operation needs a single exp(-d*s - a*sqrt(s)) factor.")
+        return next(iter(self.terms.items()))
+
+    def __add__(self, other):
+        other = self._coerce(other)
+        terms = dict(self.terms)
+        for key, series in other.terms.items():
+            terms[key] = terms[key] + series if key in terms else series
+        return _LargeS(terms, self.order)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return _LargeS({key: -series for key, series in self.terms.items()}, self.order)
+
+    def __sub__(self, other):
+        return self + (-self._coerce(other))
+
+    def __rsub__(self, other):
+        return self._coerce(other) - self
+
+    def __mul__(self, other):
+        if not isinstance(other, _LargeS):
+            return _LargeS({key: series * other for key, series in self.terms.items()}, self.order)
+        terms = {}
+        for (d1, a1), s1 in self.terms.items():
+            for (d2, a2), s2 in other.terms.items():
+                key = self._key(d1 + d2, a1 + a2)
+                terms[key] = terms[key] + s1 * s2 if key in terms else s1 * s2
+        return _LargeS(terms, self.order)
+
+    __rmul__ = __mul__
+
+    def reciprocal(self):
+        # dominant factor: smallest delay, then smallest a; the rest is expanded geometrically
+        dominant = min(self.terms)
+        (d, a), series = dominant, self.terms[dominant]
+        inverse = _LargeS({self._key(-d, -a): series.reciprocal()}, self.order)
+        eps = _LargeS({key: s for key, s in self.terms.items() if key != dominant}, self.order) * inverse
+        result, power = inverse, inverse
+        for _ in range(GEOMETRIC_TERMS):
+            if not eps.terms:
+                break
+            power = -(power * eps)
+            result = result + power
+        return result
+
+    def __truediv__(self, other):
+        if not isinstance(other, _LargeS):
+            return self * (1 / other)
+        return self * other.reciprocal()
+
+    def __rtruediv__(self, other):
+        return self.reciprocal() * other
+
+    def exp(self):
+        (d, a), series = self._single()
+        if (d, a) != (0.0, 0.0):
+            raise NotImplementedError("exp of an exponential factor")
+        # exp(c_-2 * s + c_-1 * sqrt(s) + regular part) = exp(-d*s - a*sqrt(s)) * exp(regular part)
+        if series.valuation < -2:
+            raise ValueError("exp argument grows faster than s")
+        d, a = -series.coefficient(-2), -series.coefficient(-1)
+        if d < -1e-12 or a < -1e-12:
+            raise ValueError("exp argument grows at large s")
+        regular = _Series(series.coeffs[max(-series.valuation, 0):], max(series.valuation, 0), series.order)
+        return _LargeS({self._key(d, a): regular.exp()}, self.order)
+
+    def sqrt(self):
+        (d, a), series = self._single()
+        return _LargeS({self._key(d / 2, a / 2): series.sqrt()}, self.order)
+
+    def tanh(self):
+        (d, a), series = self._single()
+        if (d, a) != (0.0, 0.0) or series.valuation >= 0:
+            return _LargeS({(d, a): series.tanh()}, self.order)
+        # tanh(x) = 1 + 2 * sum_k (-1)^k exp(-2k x) for x growing like sqrt(s)
+        result = self._coerce(1.0)
+        for k in range(1, GEOMETRIC_TERMS + 1):
+            result = result + 2 * (-1) ** k * (-2 * k * self).exp()
+        return result
+
+
+class _SeriesMath:
+    # namespace returned by RELAP_v4._math for series-valued s
+    @staticmethod
+    def exp(x):
+        return x.exp() if isinstance(x, (_Series, _LargeS)) else np.exp(x)
+
+    @staticmethod
+    def sqrt(x):
+        return x.sqrt() if isinstance(x, (_Series, _LargeS)) else np.sqrt(x)
+
+    @staticmethod
+    def tanh(x):
+        return x.tanh() if isinstance(x, (_Series, _LargeS)) else np.tanh(x)
+
+
+_Series.context = _SeriesMath
+_LargeS.context = _SeriesMath
+
+
+def small_s_expansion(F, order=SERIES_ORDER):
+    """
+    Laurent series of F in u = sqrt(s) about s = 0.
+    """
+    return F(_Series([1.0], 2, order))
+
+
+def large_s_expansion(F, order=SERIES_ORDER):
+    """
+    F as a sum of exp(-d*s - a*sqrt(s)) factors times Laurent series in v = 1/sqrt(s).
+    """
+    return F(_LargeS({(0.0, 0.0): _Series([1.0], -2, order)}, order))
+
+
+def _tail_terms(series, t):
+    # time-domain contribution of every retained power of u, shape (n_powers, n_times)
+    if series.valuation < -2:
+        raise ValueError("Transform has a pole of order > 1 at s = 0 (e.g. full recirculation).")
+    t = np.asarray(t, dtype=np.float64)
+    rows = []
+    for k, c in enumerate(series.coeffs):
+        m = series.valuation + k
+        if m == -2:
+            rows.append(np.full(t.shape, c))
+        elif m % 2:
+            rows.append(c * t ** (-m / 2 - 1) * rgamma(-m / 2))
+        else:
+            rows.append(np.zeros(t.shape))
+    return np.array(rows).reshape(-1, *t.shape)
+
+
+def long_time_response(series, t):
+    """
+    Late-time value of the inverse transform and an error estimate (size of the last tail term).
+    """
+    terms = _tail_terms(series, t)
+    tail = [k for k in range(len(series.coeffs)) if (series.valuation + k) % 2 and series.coeffs[k] != 0]
+    error = np.abs(terms[tail[-1]]) if tail else np.full(np.shape(t), np.inf)
+    return terms.sum(axis=0), error
+
+
+def _scaled_repeated_erfc(n_max, x):
+    # exp(x^2) * i^n erfc(x) for n = -1..n_max (rows), x > 0, from 2n i^n = i^(n-2) - 2x i^(n-1):
+    # upward from i^-1 = 2/sqrt(pi) and erfc for x < 2, downward (Miller) where upward cancels
+    x = np.asarray(x, dtype=np.float64)
+    up = np.empty((n_max + 2,) + x.shape)
+    up[0] = 2 / np.sqrt(np.pi)
+    up[1] = erfcx(x)
+    for n in range(1, n_max + 1):
+        up[n + 1] = (up[n - 1] - 2 * x * up[n]) / (2 * n)
+    if np.all(x < 2):
+        return up
+
+    top = n_max + 40
+    down = np.zeros((top + 3,) + x.shape)
+    down[top + 1] = 1.0
+    for m in range(top + 1, 0, -1):
+        down[m - 1] = 2 * m * down[m + 1] + 2 * x * down[m]
+        if m % 16 == 0:
+            # rescale before the recurrence overflows
+            scale = np.maximum(np.abs(down[m - 1]), 1e-300)
+            down[m - 1:] /= scale
+    down = down[:n_max + 2] * (up[1] / down[1])
+    return np.where(x < 2, up, down)
+
+
+def early_time_response(expansion, t):
+    """
+    Early-time value of the inverse transform and an error estimate (size of the last series term).
+    """
+    t = np.asarray(t, dtype=np.float64)
+    value = np.zeros(t.shape)
+    error = np.zeros(t.shape)
+    for (d, a), series in expansion.terms.items():
+        # only points after the delay and where exp(-a^2 / 4 tau) does not underflow contribute
+        active = (t > d) & (a ** 2 / (4 * np.maximum(t - d, 1e-300)) < 745)
+        if not active.any():
+            continue
+        tau = t[active] - d
+        if a > 0:
+            x = a / (2 * np.sqrt(tau))
+            decay = np.exp(-x ** 2)
+            repeated_erfc = _scaled_repeated_erfc(max(series.valuation + len(series.coeffs) - 3, 0), x)
+        last = None
+        for k, c in enumerate(series.coeffs):
+            n = series.valuation + k
+            if c == 0:
+                continue
+            if a > 0:
+                if n == 0:
+                    term = c * a / (2 * np.sqrt(np.pi)) * tau ** -1.5 * decay
+                elif n > 0:
+                    # L^-1[exp(-a sqrt(s)) / s^(1 + m/2)] = (4 tau)^(m/2) i^m erfc(a / (2 sqrt(tau))), m = n - 2
+                    term = c * (4 * tau) ** ((n - 2) / 2) * decay * repeated_erfc[n - 1]
+                else:
+                    raise ValueError("Transform grows too fast at large s for an early-time expansion.")
+            else:
+                # powers of 1/sqrt(s) alone; non-negative powers of s are impulses at tau = 0
+                term = c * tau ** (n / 2 - 1) / gamma(n / 2) if n > 0 else np.zeros(tau.shape)
+            value[active] += term
+            last = term
+        if last is not None:
+            error[active] += np.abs(last)
+    return value, error
+
+
+_series_cache = _LRUCache(SERIES_CACHE_SIZE)
+
+
+def _expansions(F, series_order, key):
+    # (small-s, large-s) expansions of F, None where F has no such expansion
+    def build():
+        expansions = []
+        for expansion in (small_s_expansion, large_s_expansion):
+            try:
+                expansions.append(expansion(F, series_order))
+            except (ValueError, NotImplementedError, ZeroDivisionError):
+                expansions.append(None)
+        return tuple(expansions)
+    if key is None:
+        return build()
+    return _series_cache.get((key, series_order), build)
+
+
+def clear_series_cache():
+    _series_cache.clear()
+
+
+def invert_with_asymptotics(
+        F, time_points, method='dehoog', order=None, atol=1e-9, plan=None, series_order=SERIES_ORDER, series_key=None):
+    """
+    Inverse transform using the early-time (large-s) expansion before, and the late-time
+    (small-s) expansion beyond, crossover times where each expansion is within `atol` of
+    the numerical inversion; numerical inversion in between.
+
+    plan      : InversionPlan for time_points; its method and order are also used for the probes
+    series_key: hashable identifying F's parameters, to reuse its expansions across calls
+
+    returns: values and the (early, late) crossover times used (-inf / inf when unused)
+    """
+    time_points = np.asarray(time_points, dtype=np.float64)
+    ordering = np.argsort(time_points, kind='stable')
+    t = time_points[ordering]
+    values = np.empty(t.shape)
+
+    if plan is not None:
+        method, order = plan.method, plan.order
+
+    def numerical(times):
+        return invert_laplace(F, times, plan=get_inversion_plan(times, method, order))
+
+    small, large = _expansions(F, series_order, series_key)
+    t_late = np.inf
+    try:
+        late_grid = t[long_time_response(small, t)[1] <= atol] if small is not None else t[:0]
+    except ValueError:
+        late_grid = t[:0]
+    # the tail estimate only sees the algebraic part; confirm against the inversion, moving later if needed
+    candidates = np.sort(late_grid)
+    while len(candidates):
+        probe = candidates[[0, len(candidates) // 2, -1]]
+        if np.all(np.abs(long_time_response(small, probe)[0] - numerical(probe)) <= 2 * atol):
+            t_late = candidates[0]
+            break
+        candidates = candidates[len(candidates) // 2 + 1:] if len(candidates) > 1 else candidates[:0]
+
+    t_early = -np.inf
+    try:
+        # contiguous run from the first time point, scanned in growing blocks
+        n_early, block = 0, 32
+        while large is not None and n_early < len(t):
+            early_ok = early_time_response(large, t[n_early:n_early + block])[1] <= atol
+            if not early_ok.all():
+                n_early += int(np.argmin(early_ok))
+                break
+            n_early += len(early_ok)
+            block *= 2
+        early_grid = t[:n_early]
+    except (ValueError, NotImplementedError, ZeroDivisionError):
+        early_grid = t[:0]
+    candidates = np.sort(early_grid)
+    while len(candidates):
+        probe = candidates[[0, len(candidates) // 2, -1]]
+        probe = probe[probe > 0]
+        if len(probe) == 0 or np.all(np.abs(early_time_response(large, probe)[0] - numerical(probe)) <= 2 * atol):
+            t_early = candidates[-1]
+            break
+        candidates = candidates[:len(candidates) // 2] if len(candidates) > 1 else candidates[:0]
+
+    late = t >= t_late
+    early = (t <= t_early) & ~late
+    middle = ~late & ~early
+    if np.any(late):
+        values[late] = long_time_response(small, t[late])[0]
+    if np.any(early):
+        values[early] = early_time_response(large, t[early])[0]
+    if np.any(middle):
+        if plan is not None and middle.all():
+            return invert_laplace(F, time_points, plan=plan), (t_early, t_late)
+        values[middle] = numerical(t[middle])
+    result = np.empty(t.shape)
+    result[ordering] = values
+    return result, (t_early, t_late)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Timing and accuracy benchmarks for the simulate* entry points.
+
+    python -m src.benchmark_suite [--quick] [--filter TEXT] [--output results.json] [--baseline baseline.json]
+
+Every entry point is timed across engines / dps, time-grid sizes (58, 500, 5000 points)
+and injection slug counts, together with the per-iteration cost of the two-fracture
+sweep workers. Each case also reports its error against the mpmath reference (dps 30)
+at a few time points. Results are written as JSON; with --baseline, cases slower than
+the baseline by more than --threshold, or markedly less accurate, are listed and the
+exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import numpy as np
+
+from . import simulation_options
+from . import fit_single_porosity_multipleFractures_parallel as fit_script
+from .simulation_options import (
+    simulateSinglePorosity, simulateDualPorosity, simulateDualPorosityInf, simulateDualPorosityfinite,
+    simulateRoseNDSSinglePoro, simulateRoseNDSSinglePoroMultiFracture, simulateRoseNDSDualPoroInf,
+    simulateRoseNDSDualPoroFinite)
+from .cache_options import set_simulation_cache
+from .Rose_data import time_points as rose_time_points
+
+
+GRID_SIZES = (58, 500, 5000)        # 58 is the Rose grid; the others span the same interval
+SLUG_COUNTS = (1, 3, 10)
+MPMATH_DPS = (8, 15, 30)            # the mpmath engine is timed on the Rose grid only
+REFERENCE_DPS = 30
+REFERENCE_POINTS = 12               # time points compared with the mpmath reference
+BACKGROUND = 0.0
+
+
+def time_grid(n_points):
+    if n_points == len(rose_time_points):
+        return np.asarray(rose_time_points, dtype=np.float64)
+    return np.linspace(rose_time_points[0], rose_time_points[-1], n_points)
+
+
+def injection_schedule(n_slugs):
+    # alternating 7 / 3 mg/L slugs of 1.5 time units each, then displacing water
+    inj_concs = np.append(np.resize([7.0, 3.0], n_slugs), 0.0)
+    inj_durs = np.cumsum(np.full(n_slugs, 1.5))
+    return inj_concs, inj_durs
+
+
+# --- entry points: (time_points, inj_concs, inj_durs, engine, dps) -> concentrations ---
+
+def _single_porosity(t, inj_concs, inj_durs, engine, dps):
+    return simulateSinglePorosity(12.0, 20.0, 1.0, t, BACKGROUND, inj_concs, inj_durs, engine=engine, dps=dps)
+
+def _single_porosity_recirculation(t, inj_concs, inj_durs, engine, dps):
+    return simulateSinglePorosity(12.0, 20.0, 1.0, t, BACKGROUND, inj_concs, inj_durs, recRatio=0.2, engine=engine, dps=dps)
+
+def _dual_porosity(t, inj_concs, inj_durs, engine, dps):
+    return simulateDualPorosity(12.0, 20.0, 1.0, t, BACKGROUND, inj_concs, inj_durs, 0.2, 0.3, 1.5, engine=engine, dps=dps)
+
+def _dual_porosity_inf(t, inj_concs, inj_durs, engine, dps):
+    return simulateDualPorosityInf(12.0, 20.0, 0.4, 0.5, 1.0, 1.5, t, BACKGROUND, inj_concs, inj_durs, engine=engine, dps=dps)
+
+def _dual_porosity_finite(t, inj_concs, inj_durs, engine, dps):
+    return simulateDualPorosityfinite(12.0, 20.0, 0.4, 0.5, 3.0, 1.0, 1.5, t, BACKGROUND, inj_concs, inj_durs, engine=engine, dps=dps)
+
+# the Rose wrappers fix the grid and schedule
+def _rose_single_porosity(t, inj_concs, inj_durs, engine, dps):
+    return simulateRoseNDSSinglePoro(12.0, 20.0, engine=engine, dps=dps)
+
+def _rose_multi_fracture(t, inj_concs, inj_durs, engine, dps):
+    return simulateRoseNDSSinglePoroMultiFracture([12.0, 30.0], [20.0, 8.0], [0.6, 0.4], engine=engine, dps=dps)
+
+def _rose_dual_porosity_inf(t, inj_concs, inj_durs, engine, dps):
+    return simulateRoseNDSDualPoroInf(12.0, 20.0, 0.4, 0.5, engine=engine, dps=dps)
+
+def _rose_dual_porosity_finite(t, inj_concs, inj_durs, engine, dps):
+    return simulateRoseNDSDualPoroFinite(12.0, 20.0, 0.4, 0.5, 3.0, engine=engine, dps=dps)
+
+ENTRY_POINTS = {
+    # name: (function, varies grid and schedule)
+    'simulateSinglePorosity': (_single_porosity, True),
+    'simulateSinglePorosity_recirculation': (_single_porosity_recirculation, True),
+    'simulateDualPorosity': (_dual_porosity, True),
+    'simulateDualPorosityInf': (_dual_porosity_inf, True),
+    'simulateDualPorosityfinite': (_dual_porosity_finite, True),
+    'simulateRoseNDSSinglePoro': (_rose_single_porosity, False),
+    'simulateRoseNDSSinglePoroMultiFracture': (_rose_multi_fracture, False),
+    'simulateRoseNDSDualPoroInf': (_rose_dual_porosity_inf, False),
+    'simulateRoseNDSDualPoroFinite': (_rose_dual_porosity_finite, False),
+}
+
+
+def cases(quick=False):
+    """
+    (name, entry, engine, dps, grid size, slug count) for every benchmark case.
+    """
+    grids = GRID_SIZES[:1] if quick else GRID_SIZES
+    slugs = SLUG_COUNTS[:1] if quick else SLUG_COUNTS
+    dps_values = MPMATH_DPS[:1] if quick else MPMATH_DPS
+    for entry, (_, varies) in ENTRY_POINTS.items():
+        for n_points in (grids if varies else GRID_SIZES[:1]):
+            for n_slugs in (slugs if varies else SLUG_COUNTS[:1]):
+                yield f'{entry}[numpy,grid={n_points},slugs={n_slugs}]', entry, 'numpy', 8, n_points, n_slugs
+        for dps in dps_values:
+            yield f'{entry}[mpmath,dps={dps},grid={GRID_SIZES[0]},slugs=1]', entry, 'mpmath', dps, GRID_SIZES[0], 1
+
+
+def _repeat(call, min_time, min_repeats, max_repeats):
+    times = []
+    while len(times) < min_repeats or (sum(times) < min_time and len(times) < max_repeats):
+        start = time.perf_counter()
+        result = call()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def _summary(times, per=1):
+    times = np.asarray(times) / per
+    return {
+        'median': float(np.median(times)),
+        'min': float(np.min(times)),
+        'iqr': float(np.subtract(*np.percentile(times, [75, 25]))),
+        'repeats': len(times),
+    }
+
+
+def _reference_indices(n_points, n_reference):
+    return np.unique(np.round(np.linspace(0, n_points - 1, n_reference)).astype(int))
+
+
+def run_cases(quick=False, name_filter=None, accuracy=True, min_time=0.2, min_repeats=3, max_repeats=100):
+    results = {}
+    references = {}
+    n_reference = REFERENCE_POINTS // 2 if quick else REFERENCE_POINTS
+    for name, entry, engine, dps, n_points, n_slugs in cases(quick):
+        if name_filter and name_filter not in name:
+            continue
+        function, varies = ENTRY_POINTS[entry]
+        t = time_grid(n_points)
+        inj_concs, inj_durs = injection_schedule(n_slugs)
+
+        def call():
+            return function(t, inj_concs, inj_durs, engine, dps)
+
+        # the warm-up call builds the inversion plan and cached input values
+        start = time.perf_counter()
+        values = np.asarray(call())
+        first = time.perf_counter() - start
+        if engine == 'mpmath':
+            # one mpmath pass already takes seconds: time it once more at most
+            _, times = _repeat(call, min_time, 1, 1 if first > min_time else min_repeats)
+        else:
+            _, times = _repeat(call, min_time, min_repeats, max_repeats)
+        result = dict(_summary(times), first_call=first, entry=entry, engine=engine, dps=dps,
+                      grid=n_points, slugs=n_slugs)
+
+        if accuracy:
+            index = _reference_indices(n_points, n_reference)
+            key = (entry, n_points, n_slugs)
+            if key not in references:
+                # the reference path is the mpmath engine on the sampled times, called directly
+                references[key] = np.asarray(
+                    function(t[index], inj_concs, inj_durs, 'mpmath', REFERENCE_DPS)
+                    if varies else function(t, inj_concs, inj_durs, 'mpmath', REFERENCE_DPS)[index])
+            reference = references[key]
+            scale = np.max(np.abs(reference - BACKGROUND))
+            result['max_rel_error'] = float(np.max(np.abs(values[index] - reference)) / scale)
+        results[name] = result
+        print(f"{name:<72} {result['median'] * 1e3:10.3f} ms"
+              + (f"  err {result['max_rel_error']:.1e}" if accuracy else ''), flush=True)
+    return results
+
+
+# --- two-fracture sweep workers ---
+
+def run_workers(quick=False, seed=0, min_time=0.2):
+    rng = np.random.default_rng(seed)
+    n = 64 if quick else 256
+    mrt_1, mrt_2 = rng.uniform(1, 50, n), rng.uniform(1, 50, n)
+    pec_1, pec_2 = rng.uniform(1, 100, n), rng.uniform(1, 100, n)
+    frec = rng.uniform(0.01, 1, n)
+    iterations = np.arange(n)
+
+    results = {}
+    fit_script._run_one(0, mrt_1[0], pec_1[0], frec[0], mrt_2[0], pec_2[0])
+    n_single = 16 if quick else 64
+
+    def run_single():
+        for i in range(n_single):
+            fit_script._run_one(i, mrt_1[i], pec_1[i], frec[i], mrt_2[i], pec_2[i])
+
+    _, times = _repeat(run_single, min_time, 3, 50)
+    results['_run_one[per_iteration]'] = dict(_summary(times, per=n_single), entry='_run_one', iterations=n_single)
+
+    def run_batch():
+        fit_script._run_batch(iterations, mrt_1, pec_1, frec, mrt_2, pec_2)
+
+    run_batch()
+    _, times = _repeat(run_batch, min_time, 3, 50)
+    results[f'_run_batch[per_iteration,chunk={n}]'] = dict(_summary(times, per=n), entry='_run_batch', iterations=n)
+    for name, result in results.items():
+        print(f"{name:<72} {result['median'] * 1e3:10.3f} ms", flush=True)
+    return results
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def run_benchmarks(quick=False, name_filter=None, accuracy=True, workers=True):
+    """
+    returns: {"metadata": {...}, "benchmarks": {case name: {"median", "min", "iqr", "repeats",
+              ["max_rel_error"], ...}}} with times in seconds
+    """
+    # timings must not be served from the on-disk result cache
+    set_simulation_cache(None)
+    benchmarks = run_cases(quick=quick, name_filter=name_filter, accuracy=accuracy)
+    if workers and (not name_filter or '_run_' in name_filter):
+        benchmarks.update(run_workers(quick=quick))
+    return {'metadata': _metadata(), 'benchmarks': benchmarks}
+
+
+def compare(results, baseline, threshold=1.25, noise=1e-4):
+    """
+    Cases whose median time exceeds the baseline by more than `threshold` (and by more than
+    `noise` seconds), or whose error grew tenfold (and above 1e-10).
+
+    returns: list of (case name, message)
+    """
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        previous = baseline['benchmarks'].get(name)
+        if previous is None:
+            continue
+        ratio = result['median'] / previous['median']
+        if ratio > threshold and result['median'] - previous['median'] > noise:
+            regressions.append((name, f"{ratio:.2f}x slower ({previous['median'] * 1e3:.3f} -> {result['median'] * 1e3:.3f} ms)"))
+        if 'max_rel_error' in result and 'max_rel_error' in previous:
+            if result['max_rel_error'] > max(10 * previous['max_rel_error'], 1e-10):
+                regressions.append((name, f"error {previous['max_rel_error']:.1e} -> {result['max_rel_error']:.1e}"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='Rose grid, one slug and dps 8 only')
+    parser.add_argument('--filter', help='only cases whose name contains this text')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON results file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    parser.add_argument('--no-accuracy', action='store_true', help='skip the mpmath reference comparison')
+    args = parser.parse_args()
+
+    results = run_benchmarks(quick=args.quick, name_filter=args.filter, accuracy=not args.no_accuracy)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, threshold=args.threshold)
+        for name, message in regressions:
+            print(f'REGRESSION {name}: {message}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+import os
+import glob
+import time
+import uuid
+import hashlib
+import inspect
+import zipfile
+import functools
+import threading
+import numpy as np
+
+
+# Opt-in on-disk memoization of the simulate* functions.
+#
+# Results are stored one file per call under a content hash of the function, its
+# arguments (floats rounded to SIGNIFICANT_DIGITS, so arrays that differ only in the
+# last bits share an entry) and the source of the package, so editing the model
+# invalidates old entries. Files are written to a temporary name and renamed into
+# place, so concurrent worker processes never see partial entries; the least recently
+# used entries are deleted once the directory grows past max_bytes.
+#
+#     set_simulation_cache('~/.cache/tracer-model', max_bytes=2 ** 30)
+#
+# The location is also exported as TRACER_SIMULATION_CACHE, so worker processes started
+# afterwards use the same cache.
+
+CACHE_ENV = 'TRACER_SIMULATION_CACHE'
+CACHE_BYTES_ENV = 'TRACER_SIMULATION_CACHE_BYTES'
+DEFAULT_MAX_BYTES = 2 ** 30
+SIGNIFICANT_DIGITS = 12
+ENTRY_SUFFIX = '.npz'
+
+_active = {'cache': None}
+_calls = threading.local()
+
+
+def _source_version():
+    # hash of every module in the package: results are only reused for the same model code
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _round_significant(values, digits):
+    values = np.asarray(values, dtype=np.float64)
+    mantissa, exponent = np.frexp(values)
+    scale = 2.0 ** int(np.ceil(digits * np.log2(10)))
+    return np.ldexp(np.round(mantissa * scale) / scale, exponent)
+
+
+def _update_key(digest, value, digits):
+    if value is None or isinstance(value, (bool, str)):
+        digest.update(repr(value).encode())
+    elif hasattr(value, 'abscissae') and hasattr(value, 'method'):
+        # an InversionPlan: its time grid is one of the arguments, method and order are not
+        digest.update(f'plan:{value.method}:{value.order}'.encode())
+    elif isinstance(value, dict):
+        digest.update(b'dict')
+        for name in sorted(value):
+            digest.update(str(name).encode())
+            _update_key(digest, value[name], digits)
+    else:
+        try:
+            array = np.asarray(value, dtype=np.float64)
+        except (TypeError, ValueError):
+            if isinstance(value, (list, tuple)):
+                digest.update(f'seq{len(value)}'.encode())
+                for item in value:
+                    _update_key(digest, item, digits)
+                return
+            raise TypeError(f"Cannot derive a cache key from {type(value).__name__}.")
+        digest.update(repr(array.shape).encode())
+        digest.update(np.ascontiguousarray(_round_significant(array, digits)).tobytes())
+
+
+class SimulationCache:
+    """
+    Content-addressed store of simulation results in the directory `path`.
+
+    key(function, arguments) -> hex digest
+    get(key)                 -> stored result or None
+    put(key, result)         -> store an array or a tuple of arrays
+    """
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, significant_digits=SIGNIFICANT_DIGITS):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_bytes = int(max_bytes)
+        self.significant_digits = significant_digits
+        os.makedirs(self.path, exist_ok=True)
+        self._version = _source_version()
+        self._lock = threading.Lock()
+        # bytes written since the last size check; starts full so the first write checks
+        self._unchecked_bytes = self.max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, function, arguments):
+        digest = hashlib.sha256(self._version.encode())
+        digest.update(f'{function.__module__}.{function.__qualname__}'.encode())
+        for name in sorted(arguments):
+            digest.update(name.encode())
+            _update_key(digest, arguments[name], self.significant_digits)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with np.load(entry_path) as entry:
+                arrays = [entry[f'result_{i}'] for i in range(int(entry['n_results']))]
+                is_tuple = bool(entry['is_tuple'])
+            os.utime(entry_path)
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            # missing, evicted meanwhile by another process, or unreadable: recompute
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tuple(arrays) if is_tuple else arrays[0]
+
+    def put(self, key, result):
+        is_tuple = isinstance(result, tuple)
+        arrays = {f'result_{i}': np.asarray(value) for i, value in enumerate(result if is_tuple else (result,))}
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f'{entry_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, n_results=len(arrays), is_tuple=is_tuple, **arrays)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, entry_path)
+
+        with self._lock:
+            self._unchecked_bytes += size
+            check = self._unchecked_bytes >= self.max_bytes // 10
+            if check:
+                self._unchecked_bytes = 0
+        if check:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith('.tmp'):
+                    # temporary file of a writer that died; live writers finish in well under an hour
+                    if time.time() - stat.st_mtime > 3600:
+                        _remove(entry.path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache is below 90% of max_bytes.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, entry_path in sorted(entries):
+            if total <= 0.9 * self.max_bytes:
+                break
+            _remove(entry_path)
+            total -= size
+
+    def clear(self):
+        for _, _, entry_path in self._entries():
+            _remove(entry_path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def set_simulation_cache(path, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Turn the simulate* cache on in `path`, or off with path=None.
+    """
+    if path is None:
+        _active['cache'] = None
+        os.environ.pop(CACHE_ENV, None)
+        os.environ.pop(CACHE_BYTES_ENV, None)
+        return None
+    _active['cache'] = SimulationCache(path, max_bytes=max_bytes)
+    os.environ[CACHE_ENV] = _active['cache'].path
+    os.environ[CACHE_BYTES_ENV] = str(int(max_bytes))
+    return _active['cache']
+
+
+def get_simulation_cache():
+    cache = _active['cache']
+    path = os.environ.get(CACHE_ENV)
+    if cache is None and path:
+        # worker process started with the cache exported by its parent
+        cache = SimulationCache(path, max_bytes=int(os.environ.get(CACHE_BYTES_ENV, DEFAULT_MAX_BYTES)))
+        _active['cache'] = cache
+    return cache
+
+
+def memoize_simulation(function):
+    """
+    Serve calls of `function` from the active cache. Only the outermost simulate* call
+    is cached (wrappers calling other simulate* functions are stored once), and calls
+    whose arguments cannot be hashed run uncached.
+    """
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        cache = get_simulation_cache()
+        if cache is None or getattr(_calls, 'depth', 0) > 0:
+            return function(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        try:
+            key = cache.key(function, bound.arguments)
+        except TypeError:
+            key = None
+        if key is not None:
+            result = cache.get(key)
+            if result is not None:
+                return result
+
+        _calls.depth = 1
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            _calls.depth = 0
+        if key is not None:
+            try:
+                cache.put(key, result)
+            except OSError:
+                # a full or read-only cache directory must not fail the simulation
+                pass
+        return result
+
+    return wrapper
@@ -0,0 +1,622 @@
+import numpy as np
+from scipy.optimize import least_squares
+
+from .RELAP_v4 import GroundWaterInfiniteMatrixSolution, Input_Pulses_of_Tracer, WellboreStorage, PipelineDelay
+from .inversion_algorithms import get_inversion_plan
+from .sampling_algorithms import lhs_sample
+from .metrics_options import least_squares_error, calcR2
+
+
+# Gradient-based calibration of the single-porosity multi-fracture model.
+#
+# The Jacobian is built in the Laplace domain from the analytic sensitivities of
+# GroundWaterInfiniteMatrixSolution (log_derivatives) and the recirculation loop
+# F = L / (1 - r*L), and inverted in the same pass as the model itself.
+
+class MultiFractureModel:
+    """
+    N single-porosity flow paths with fractional recoveries, optional shared recirculation,
+    wellbore storage and pipeline delay (inside the recirculation loop, as in
+    simulateDualPorosity), on a fixed time grid and injection schedule.
+
+    Free parameters, in order: mean_residence_time_1..N, peclet_number_1..N,
+    fractional_recovery_1..N-1 (the last path takes 1 - sum of the others), then
+    frac_retard, dualPorosity_param, recRatio and delay_time when they are fitted. With
+    dualPorosity_param > 0 every path is an infinite-matrix dual-porosity path.
+    """
+    def __init__(
+            self,
+            n_paths,
+            time_points,
+            bckgrnd_conc,
+            inj_concs,
+            inj_durs,
+            frac_retard=1.0,
+            recRatio=0.0,
+            wsCoef=0.0,
+            dualPorosity_param=0.0,
+            matrix_retardation=1.0,
+            delay_time=0.0,
+            fit_frac_retard=False,
+            fit_recRatio=False,
+            fit_dualPorosity_param=False,
+            fit_delay_time=False,
+            method='dehoog',
+            order=None):
+        self.n_paths = n_paths
+        self.bckgrnd_conc = bckgrnd_conc
+        self.frac_retard = frac_retard
+        self.recRatio = recRatio
+        self.dualPorosity_param = dualPorosity_param
+        self.matrix_retardation = matrix_retardation
+        self.delay_time = delay_time
+        self.fit_frac_retard = fit_frac_retard
+        self.fit_recRatio = fit_recRatio
+        self.fit_dualPorosity_param = fit_dualPorosity_param
+        self.fit_delay_time = fit_delay_time
+        self.plan = get_inversion_plan(time_points, method, order)
+
+        s = self.plan.abscissae
+        tracer_injection = Input_Pulses_of_Tracer(
+            background_concentration=bckgrnd_conc,
+            injection_concentrations=inj_concs,
+            injection_durations=inj_durs
+        )
+        self._input_values = tracer_injection(s)
+        self._wellbore_values = WellboreStorage(wsCoef)(s) if wsCoef > 0 else 1
+        self.n_evaluations = 0
+
+    @property
+    def parameter_names(self):
+        names = [f'mean_residence_time_{j + 1}' for j in range(self.n_paths)]
+        names += [f'peclet_number_{j + 1}' for j in range(self.n_paths)]
+        names += [f'fractional_recovery_{j + 1}' for j in range(self.n_paths - 1)]
+        if self.fit_frac_retard:
+            names.append('frac_retard')
+        if self.fit_dualPorosity_param:
+            names.append('dualPorosity_param')
+        if self.fit_recRatio:
+            names.append('recRatio')
+        if self.fit_delay_time:
+            names.append('delay_time')
+        return names
+
+    def _unpack(self, theta):
+        N = self.n_paths
+        theta = np.asarray(theta, dtype=np.float64)
+        mrts, pecs = theta[:N], theta[N:2 * N]
+        frecs = np.append(theta[2 * N:3 * N - 1], 1 - np.sum(theta[2 * N:3 * N - 1]))
+        position = 3 * N - 1
+        frac_retard, dualPorosity_param, recRatio = self.frac_retard, self.dualPorosity_param, self.recRatio
+        if self.fit_frac_retard:
+            frac_retard = theta[position]
+            position += 1
+        if self.fit_dualPorosity_param:
+            dualPorosity_param = theta[position]
+            position += 1
+        if self.fit_recRatio:
+            recRatio = theta[position]
+            position += 1
+        delay_time = theta[position] if self.fit_delay_time else self.delay_time
+        return mrts, pecs, frecs, frac_retard, dualPorosity_param, recRatio, delay_time
+
+    def evaluate(self, theta, jacobian=True):
+        """
+        returns: concentrations (n_times,) and, if `jacobian`, d concentration / d theta (n_times, n_free)
+        """
+        N = self.n_paths
+        mrts, pecs, frecs, frac_retard, dualPorosity_param, recRatio, delay_time = self._unpack(theta)
+        s = self.plan.abscissae
+        loop_values = self._wellbore_values
+        if self.fit_delay_time or delay_time != 0:
+            loop_values = loop_values * PipelineDelay(delay_time)(s)
+
+        paths, path_derivatives = [], []
+        for mrt, pec in zip(mrts, pecs):
+            node = GroundWaterInfiniteMatrixSolution(
+                mrt, pec, dualPorosity_param, 0, fracture_retardation=frac_retard, matrix_retardation=self.matrix_retardation)
+            G = node(s)
+            paths.append(G)
+            if jacobian:
+                path_derivatives.append({name: G * value for name, value in node.log_derivatives(s).items()})
+
+        L = loop_values * sum(w * G for w, G in zip(frecs, paths))
+        denominator = 1 - recRatio * L
+        transforms = [L / denominator * self._input_values]
+
+        if jacobian:
+            # dF/dL for F = L / (1 - r*L), applied to every loop derivative
+            scale = loop_values * self._input_values / denominator ** 2
+            transforms += [scale * frecs[j] * path_derivatives[j]['mean_residence_time'] for j in range(N)]
+            transforms += [scale * frecs[j] * path_derivatives[j]['peclet_number'] for j in range(N)]
+            transforms += [scale * (paths[j] - paths[-1]) for j in range(N - 1)]
+            if self.fit_frac_retard:
+                transforms.append(scale * sum(frecs[j] * path_derivatives[j]['fracture_retardation'] for j in range(N)))
+            if self.fit_dualPorosity_param:
+                transforms.append(scale * sum(frecs[j] * path_derivatives[j]['dualPorosity_param'] for j in range(N)))
+            if self.fit_recRatio:
+                transforms.append(L ** 2 / denominator ** 2 * self._input_values)
+            if self.fit_delay_time:
+                # d exp(-s*delay) / d delay = -s * exp(-s*delay)
+                transforms.append(-s * L / denominator ** 2 * self._input_values)
+
+        values = self.plan.invert(np.stack(np.broadcast_arrays(*transforms)))
+        self.n_evaluations += 1
+        concentrations = self.bckgrnd_conc + values[0]
+        if jacobian:
+            return concentrations, values[1:].T
+        return concentrations
+
+
+def calibrate_multi_fracture(
+        time_points,
+        observed,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        bounds,
+        n_paths=2,
+        n_starts=8,
+        seed=None,
+        frac_retard=1.0,
+        recRatio=0.0,
+        wsCoef=0.0,
+        dualPorosity_param=0.0,
+        matrix_retardation=1.0,
+        delay_time=0.0,
+        max_nfev=200):
+    """
+    Bounded trust-region least squares (scipy 'trf') from `n_starts` Latin hypercube starting points.
+
+    bounds : {"mean_residence_time": [min, max], "peclet_number": [min, max],
+              "fractional_recovery": [min, max]} shared by every path; add "frac_retard",
+              "dualPorosity_param", "recRatio" and/or "delay_time" ranges to fit them as well
+              (otherwise the fixed values are used).
+              With n_paths > 2 the last path's recovery (1 - sum) is not bounded.
+
+    returns: {"parameters": {...}, "MSE": float, "R2": float, "n_evaluations": int, "starts": [...]}
+             with starts sorted by MSE
+    """
+    observed = np.asarray(observed, dtype=np.float64)
+    model = MultiFractureModel(
+        n_paths, time_points, bckgrnd_conc, inj_concs, inj_durs,
+        frac_retard=frac_retard, recRatio=recRatio, wsCoef=wsCoef,
+        dualPorosity_param=dualPorosity_param, matrix_retardation=matrix_retardation, delay_time=delay_time,
+        fit_frac_retard='frac_retard' in bounds, fit_recRatio='recRatio' in bounds,
+        fit_dualPorosity_param='dualPorosity_param' in bounds, fit_delay_time='delay_time' in bounds)
+
+    names = model.parameter_names
+    ranges = {name: bounds[name.rsplit('_', 1)[0]] if name[-1].isdigit() else bounds[name] for name in names}
+    lower = np.array([ranges[name][0] for name in names], dtype=np.float64)
+    upper = np.array([ranges[name][1] for name in names], dtype=np.float64)
+    starts = lhs_sample(ranges, n_starts, seed=seed)
+
+    last = {}
+
+    def evaluate(theta):
+        key = theta.tobytes()
+        if last.get('key') != key:
+            last['key'] = key
+            last['value'] = model.evaluate(theta)
+        return last['value']
+
+    results = []
+    for i in range(n_starts):
+        x0 = np.array([starts[name][i] for name in names], dtype=np.float64)
+        fit = least_squares(
+            lambda theta: evaluate(theta)[0] - observed,
+            x0,
+            jac=lambda theta: evaluate(theta)[1],
+            bounds=(lower, upper),
+            method='trf',
+            x_scale='jac',
+            max_nfev=max_nfev)
+        prediction = model.evaluate(fit.x, jacobian=False)
+        results.append({
+            'parameters': dict(zip(names, fit.x.tolist())),
+            'MSE': float(least_squares_error(prediction, observed, mean=True)),
+            'R2': float(calcR2(prediction, observed)),
+            'success': bool(fit.success),
+        })
+
+    results.sort(key=lambda result: result['MSE'])
+    best = dict(results[0])
+    best['n_evaluations'] = model.n_evaluations
+    best['starts'] = results
+    return best
+
+
+
+# Online calibration while samples arrive during a circulation test.
+#
+# New samples are first scored at the current optimum (the model is evaluated only at
+# the new times), then the fit is refined from that optimum with a few trust-region
+# steps. The refit works on a bounded set of points: every sample while there are at
+# most max_points, afterwards the newest half of the budget plus the older record thinned
+# evenly in time, each kept old sample weighted for the ones it stands in for. Refit cost
+# therefore stops growing with the length of the record.
+
+class StreamingCalibration:
+    """
+    Warm-started incremental refit of MultiFractureModel (single or dual porosity, one or
+    more paths) to a growing record of (time, concentration) samples.
+
+    initial: {parameter name: value} starting point, names as MultiFractureModel.parameter_names
+    bounds : ranges as for calibrate_multi_fracture; they also choose the fitted parameters
+
+    update(times, concentrations) -> {"parameters", "innovation", "MSE", "n_points", "nfev"}; MSE is
+                                     over the refit points, or the new samples if no refit was
+                                     needed (innovation RMS <= refit_tol)
+    history                       -> one such record (without innovations) per update
+    """
+    def __init__(
+            self,
+            initial,
+            bounds,
+            bckgrnd_conc,
+            inj_concs,
+            inj_durs,
+            n_paths=1,
+            frac_retard=1.0,
+            recRatio=0.0,
+            wsCoef=0.0,
+            dualPorosity_param=0.0,
+            matrix_retardation=1.0,
+            delay_time=0.0,
+            max_points=200,
+            max_nfev=20,
+            refit_tol=0.0,
+            method='dehoog',
+            order=None):
+        self.model_options = dict(
+            bckgrnd_conc=bckgrnd_conc, inj_concs=inj_concs, inj_durs=inj_durs,
+            frac_retard=frac_retard, recRatio=recRatio, wsCoef=wsCoef,
+            dualPorosity_param=dualPorosity_param, matrix_retardation=matrix_retardation, delay_time=delay_time,
+            fit_frac_retard='frac_retard' in bounds, fit_recRatio='recRatio' in bounds,
+            fit_dualPorosity_param='dualPorosity_param' in bounds, fit_delay_time='delay_time' in bounds,
+            method=method, order=order)
+        self.n_paths = n_paths
+        self.max_points = max_points
+        self.max_nfev = max_nfev
+        self.refit_tol = refit_tol
+
+        self.parameter_names = self._model(np.array([1.0])).parameter_names
+        self.theta = np.array([initial[name] for name in self.parameter_names], dtype=np.float64)
+        ranges = [bounds[name.rsplit('_', 1)[0]] if name[-1].isdigit() else bounds[name] for name in self.parameter_names]
+        self.lower = np.array([r[0] for r in ranges], dtype=np.float64)
+        self.upper = np.array([r[1] for r in ranges], dtype=np.float64)
+
+        self.time_points = np.empty(0)
+        self.observed = np.empty(0)
+        self.n_evaluations = 0
+        self.history = []
+
+    def _model(self, time_points):
+        return MultiFractureModel(self.n_paths, time_points, **self.model_options)
+
+    @property
+    def parameters(self):
+        return dict(zip(self.parameter_names, self.theta.tolist()))
+
+    def predict(self, time_points):
+        model = self._model(np.asarray(time_points, dtype=np.float64))
+        self.n_evaluations += 1
+        return model.evaluate(self.theta, jacobian=False)
+
+    def _active_set(self):
+        # indices and weights of the samples the refit uses
+        n = len(self.time_points)
+        if n <= self.max_points:
+            return np.arange(n), np.ones(n)
+        n_recent = self.max_points // 2
+        n_old = n - n_recent
+        old = np.unique(np.round(np.linspace(0, n_old - 1, self.max_points - n_recent)).astype(int))
+        weights = np.append(np.full(len(old), np.sqrt(n_old / len(old))), np.ones(n_recent))
+        return np.append(old, np.arange(n_old, n)), weights
+
+    def update(self, time_points, concentrations):
+        time_points = np.atleast_1d(np.asarray(time_points, dtype=np.float64))
+        concentrations = np.atleast_1d(np.asarray(concentrations, dtype=np.float64))
+        innovation = concentrations - self.predict(time_points)
+
+        order = np.argsort(np.append(self.time_points, time_points), kind='stable')
+        self.time_points = np.append(self.time_points, time_points)[order]
+        self.observed = np.append(self.observed, concentrations)[order]
+
+        nfev = 0
+        if np.sqrt(np.mean(innovation ** 2)) > self.refit_tol:
+            index, weights = self._active_set()
+            # plans need distinct increasing times; repeated sample times are merged
+            times, inverse = np.unique(self.time_points[index], return_inverse=True)
+            model = self._model(times)
+            observed = self.observed[index]
+            last = {}
+
+            def evaluate(theta):
+                key = theta.tobytes()
+                if last.get('key') != key:
+                    concentrations, jacobian = model.evaluate(theta)
+                    last['key'] = key
+                    last['value'] = (
+                        weights * (concentrations[inverse] - observed),
+                        weights[:, None] * jacobian[inverse])
+                return last['value']
+
+            fit = least_squares(
+                lambda theta: evaluate(theta)[0],
+                np.clip(self.theta, self.lower, self.upper),
+                jac=lambda theta: evaluate(theta)[1],
+                bounds=(self.lower, self.upper),
+                method='trf',
+                x_scale='jac',
+                max_nfev=self.max_nfev)
+            self.theta = fit.x
+            self.n_evaluations += model.n_evaluations
+            nfev = fit.nfev
+            residuals = evaluate(fit.x)[0] / weights
+        else:
+            residuals = innovation
+
+        record = {
+            'time': float(self.time_points[-1]),
+            'parameters': self.parameters,
+            'MSE': float(np.mean(residuals ** 2)),
+            'n_points': len(self.time_points),
+            'nfev': int(nfev),
+        }
+        self.history.append(record)
+        return dict(record, innovation=innovation)
+
+
+# Joint calibration of several tracers injected together.
+#
+# The tracers share the flow field (mean residence times, Peclet numbers, fractional
+# recoveries and recirculation) and differ only in retardation and decay. All tracers
+# and flow paths are evaluated in one broadcast pass on the shared abscissae, the
+# tracer-only parts of the kernel once per tracer, and the model with all Jacobian
+# columns is inverted in a single call.
+
+TRACER_PARAMETERS = {
+    # name: default when a tracer does not set it
+    'frac_retard': 1.0,
+    'matrix_retardation': 1.0,
+    'thermal_degradation_coeff': 0.0,
+}
+
+class MultiTracerModel:
+    """
+    N flow paths shared by several tracers, each with its own injection schedule,
+    background and retardation / decay parameters.
+
+    tracers: list of {"name": str, "bckgrnd_conc": float, "inj_concs": [...], "inj_durs": [...],
+             optional TRACER_PARAMETERS values, "fit": [names from TRACER_PARAMETERS]}
+
+    Free parameters, in order: the shared ones of MultiFractureModel (mean_residence_time_1..N,
+    peclet_number_1..N, fractional_recovery_1..N-1, recRatio when fitted), then for each tracer
+    its fitted parameters named '<parameter>_<tracer name>'.
+    """
+    def __init__(
+            self,
+            n_paths,
+            time_points,
+            tracers,
+            recRatio=0.0,
+            wsCoef=0.0,
+            dualPorosity_param=0.0,
+            fit_recRatio=False,
+            method='dehoog',
+            order=None):
+        self.n_paths = n_paths
+        self.tracers = [dict(tracer) for tracer in tracers]
+        self.recRatio = recRatio
+        self.dualPorosity_param = dualPorosity_param
+        self.fit_recRatio = fit_recRatio
+        self.plan = get_inversion_plan(time_points, method, order)
+        for tracer in self.tracers:
+            for name in tracer.get('fit', []):
+                if name not in TRACER_PARAMETERS:
+                    raise ValueError(f"Unknown tracer parameter '{name}'. Choose from {list(TRACER_PARAMETERS)}.")
+
+        s = self.plan.abscissae
+        self.bckgrnd_concs = np.array([tracer['bckgrnd_conc'] for tracer in self.tracers], dtype=np.float64)
+        self._input_values = np.stack([
+            Input_Pulses_of_Tracer(
+                background_concentration=tracer['bckgrnd_conc'],
+                injection_concentrations=np.asarray(tracer['inj_concs'], dtype=np.float64),
+                injection_durations=np.asarray(tracer['inj_durs'], dtype=np.float64)
+            )(s) for tracer in self.tracers])
+        self._wellbore_values = WellboreStorage(wsCoef)(s) if wsCoef > 0 else 1
+        self.n_evaluations = 0
+
+    @property
+    def tracer_names(self):
+        return [tracer['name'] for tracer in self.tracers]
+
+    @property
+    def shared_parameter_names(self):
+        names = [f'mean_residence_time_{j + 1}' for j in range(self.n_paths)]
+        names += [f'peclet_number_{j + 1}' for j in range(self.n_paths)]
+        names += [f'fractional_recovery_{j + 1}' for j in range(self.n_paths - 1)]
+        if self.fit_recRatio:
+            names.append('recRatio')
+        return names
+
+    @property
+    def parameter_names(self):
+        names = self.shared_parameter_names
+        for tracer in self.tracers:
+            names += [f"{name}_{tracer['name']}" for name in tracer.get('fit', [])]
+        return names
+
+    def _unpack(self, theta):
+        N = self.n_paths
+        theta = np.asarray(theta, dtype=np.float64)
+        mrts, pecs = theta[:N], theta[N:2 * N]
+        frecs = np.append(theta[2 * N:3 * N - 1], 1 - np.sum(theta[2 * N:3 * N - 1]))
+        position = 3 * N - 1
+        recRatio = self.recRatio
+        if self.fit_recRatio:
+            recRatio = theta[position]
+            position += 1
+        tracer_values = {name: np.empty(len(self.tracers)) for name in TRACER_PARAMETERS}
+        for i, tracer in enumerate(self.tracers):
+            for name, default in TRACER_PARAMETERS.items():
+                tracer_values[name][i] = tracer.get(name, default)
+            for name in tracer.get('fit', []):
+                tracer_values[name][i] = theta[position]
+                position += 1
+        return mrts, pecs, frecs, recRatio, tracer_values
+
+    def evaluate(self, theta, jacobian=True):
+        """
+        returns: concentrations (n_tracers, n_times) and, if `jacobian`,
+                 d concentration / d theta (n_tracers, n_times, n_free)
+        """
+        N, T = self.n_paths, len(self.tracers)
+        mrts, pecs, frecs, recRatio, tracer_values = self._unpack(theta)
+        s = self.plan.abscissae
+
+        # GroundWaterInfiniteMatrixSolution, factored: the matrix term and q = Rf*(s+k) + dP*sqrt(Rm*(s+k))
+        # depend only on the tracer (n_tracers, n_times, K); only the advection-dispersion square
+        # root and exponential are evaluated per (path, tracer): (N, T, n_times, K)
+        tracer_axis = (slice(None), None, None)
+        path_axis = (slice(None), None, None, None)
+        Rf = tracer_values['frac_retard'][tracer_axis]
+        Rm = tracer_values['matrix_retardation'][tracer_axis]
+        k = tracer_values['thermal_degradation_coeff'][tracer_axis]
+        dP = self.dualPorosity_param
+        matrix_term = np.sqrt(Rm * (s + k))
+        q = Rf * (s + k) + dP * matrix_term
+        t, Pe = mrts[path_axis], pecs[path_axis]
+        root = np.sqrt(1 + 4 * t / Pe * q)
+        G = np.exp(-2 * t * q / (1 + root))
+        weights = frecs[path_axis]
+        L = self._wellbore_values * np.sum(weights * G, axis=0)
+        denominator = 1 - recRatio * L
+        transforms = [L / denominator * self._input_values]
+
+        if jacobian:
+            # dF/dL for F = L / (1 - r*L), applied to every loop derivative
+            scale = self._wellbore_values * self._input_values / denominator ** 2
+            dG_dmrt = -G * q / root
+            dG_dpe = G * ((1 - root) / 2 + t * q / (Pe * root))
+            transforms += [scale * frecs[j] * dG_dmrt[j] for j in range(N)]
+            transforms += [scale * frecs[j] * dG_dpe[j] for j in range(N)]
+            transforms += [scale * (G[j] - G[-1]) for j in range(N - 1)]
+            if self.fit_recRatio:
+                transforms.append(L ** 2 / denominator ** 2 * self._input_values)
+            n_shared = len(transforms) - 1
+
+            # tracer parameters enter only through q: dG/dp = -t*G/root * dq/dp
+            # (the wellbore factor of dL/dq is already in `scale`)
+            dL_dq = -np.sum(weights * t * G / root, axis=0)
+            dq = {
+                'frac_retard': lambda i: s + k[i],
+                'matrix_retardation': lambda i: dP * matrix_term[i] / (2 * Rm[i]),
+                'thermal_degradation_coeff': lambda i: Rf[i] + dP * Rm[i] / (2 * matrix_term[i]),
+            }
+            tracer_columns = []
+            for i, tracer in enumerate(self.tracers):
+                for name in tracer.get('fit', []):
+                    tracer_columns.append((i, scale[i] * dL_dq[i] * dq[name](i)))
+
+        stack = np.concatenate(
+            [np.broadcast_to(transform, L.shape) for transform in transforms]
+            + ([column[None] for _, column in tracer_columns] if jacobian else []))
+        values = self.plan.invert(stack)
+        self.n_evaluations += 1
+        n_times = values.shape[-1]
+        concentrations = self.bckgrnd_concs[:, None] + values[:T]
+        if not jacobian:
+            return concentrations
+        derivatives = np.zeros((T, n_times, n_shared + len(tracer_columns)))
+        derivatives[:, :, :n_shared] = values[T:T * (n_shared + 1)].reshape(n_shared, T, n_times).transpose(1, 2, 0)
+        for column, (i, _) in enumerate(tracer_columns):
+            derivatives[i, :, n_shared + column] = values[T * (n_shared + 1) + column]
+        return concentrations, derivatives
+
+
+def calibrate_multi_tracer(
+        time_points,
+        tracers,
+        bounds,
+        n_paths=2,
+        n_starts=8,
+        seed=None,
+        recRatio=0.0,
+        wsCoef=0.0,
+        dualPorosity_param=0.0,
+        max_nfev=200):
+    """
+    Joint least-squares fit of several tracers sampled on the same time grid.
+
+    tracers : list of tracer dicts as for MultiTracerModel, plus "observed" (n_times,) with NaN
+              for missing samples, an optional "bounds" {parameter: [min, max]} for the tracer's
+              own fitted parameters and an optional "weight" (default 1 / max |observed - background|,
+              so tracers of different strength count alike)
+    bounds  : shared ranges as for calibrate_multi_fracture ("mean_residence_time", "peclet_number",
+              "fractional_recovery", optionally "recRatio")
+
+    returns: {"parameters": {...}, "objective": float, "MSE": {tracer: float}, "R2": {tracer: float},
+              "n_evaluations": int, "starts": [...]} with starts sorted by objective
+    """
+    tracers = [dict(tracer, fit=list(tracer.get('bounds', {}))) for tracer in tracers]
+    model = MultiTracerModel(
+        n_paths, time_points, tracers, recRatio=recRatio, wsCoef=wsCoef,
+        dualPorosity_param=dualPorosity_param, fit_recRatio='recRatio' in bounds)
+
+    observed = np.stack([np.asarray(tracer['observed'], dtype=np.float64) for tracer in tracers])
+    mask = np.isfinite(observed)
+    weights = np.array([
+        tracer['weight'] if 'weight' in tracer else 1 / np.nanmax(np.abs(observed[i] - model.bckgrnd_concs[i]))
+        for i, tracer in enumerate(tracers)])
+    row_weights = np.broadcast_to(weights[:, None], observed.shape)[mask]
+
+    names = model.parameter_names
+    ranges = {name: bounds[name.rsplit('_', 1)[0]] if name[-1].isdigit() else bounds[name]
+              for name in model.shared_parameter_names}
+    for tracer in tracers:
+        ranges.update({f"{name}_{tracer['name']}": tracer['bounds'][name] for name in tracer['fit']})
+    lower = np.array([ranges[name][0] for name in names], dtype=np.float64)
+    upper = np.array([ranges[name][1] for name in names], dtype=np.float64)
+    starts = lhs_sample(ranges, n_starts, seed=seed)
+
+    last = {}
+
+    def evaluate(theta):
+        key = theta.tobytes()
+        if last.get('key') != key:
+            concentrations, derivatives = model.evaluate(theta)
+            last['key'] = key
+            last['value'] = (
+                row_weights * (concentrations[mask] - observed[mask]),
+                row_weights[:, None] * derivatives[mask])
+        return last['value']
+
+    results = []
+    for i in range(n_starts):
+        x0 = np.array([starts[name][i] for name in names], dtype=np.float64)
+        fit = least_squares(
+            lambda theta: evaluate(theta)[0],
+            x0,
+            jac=lambda theta: evaluate(theta)[1],
+            bounds=(lower, upper),
+            method='trf',
+            x_scale='jac',
+            max_nfev=max_nfev)
+        prediction = model.evaluate(fit.x, jacobian=False)
+        results.append({
+            'parameters': dict(zip(names, fit.x.tolist())),
+            'objective': float(2 * fit.cost),
+            'MSE': {tracer['name']: float(least_squares_error(prediction[j][mask[j]], observed[j][mask[j]], mean=True))
+                    for j, tracer in enumerate(tracers)},
+            'R2': {tracer['name']: float(calcR2(prediction[j][mask[j]], observed[j][mask[j]]))
+                   for j, tracer in enumerate(tracers)},
+            'success': bool(fit.success),
+        })
+
+    results.sort(key=lambda result: result['objective'])
+    best = dict(results[0])
+    best['n_evaluations'] = model.n_evaluations
+    best['starts'] = results
+    return best
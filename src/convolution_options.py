@@ -0,0 +1,82 @@
+import numpy as np
+
+from .inversion_algorithms import invert_laplace
+
+
+# Impulse-response mode for long, irregular injection histories.
+#
+# The RELAP network without its input node is inverted once for a unit
+# concentration injected over one grid step [0, dt). Any injection history sampled
+# on the same uniform grid (zero-order hold) is then a discrete convolution with
+# that pulse response, so the cost no longer depends on the number of slugs.
+
+def unit_pulse_response(loop_instance, dt, n_steps, method='dehoog', order=None):
+    """
+    loop_instance : RELAP network built with Input_Instance=Identity() (may carry leading parameter axes)
+    dt            : grid step
+    n_steps       : number of grid points t_k = k*dt, k = 0..n_steps-1 (should cover the system memory)
+
+    returns: pulse response at t_k, shape (..., n_steps), zero at t_0
+    """
+    t = dt * np.arange(1, n_steps)
+
+    def pulse(s):
+        return loop_instance(s) * (1 - np.exp(-s * dt)) / s
+
+    values = invert_laplace(pulse, t, method=method, order=order)
+    return np.concatenate([np.zeros(values.shape[:-1] + (1,)), values], axis=-1)
+
+
+def sample_injection_history(injection_times, injection_concs, dt, n_steps):
+    """
+    Zero-order-hold resampling of an injection concentration history onto t_k = k*dt:
+    each grid step takes the last recorded concentration at or before t_k.
+    """
+    injection_times = np.asarray(injection_times, dtype=np.float64)
+    injection_concs = np.asarray(injection_concs, dtype=np.float64)
+    grid = dt * np.arange(n_steps)
+    idx = np.searchsorted(injection_times, grid, side='right') - 1
+    return np.where(idx >= 0, injection_concs[np.clip(idx, 0, None)], injection_concs[0])
+
+
+def _fft_convolve(a, b, n_out):
+    n_fft = 1 << int(np.ceil(np.log2(max(a.shape[-1] + b.shape[-1] - 1, 1))))
+    spectrum = np.fft.rfft(a, n_fft) * np.fft.rfft(b, n_fft)
+    return np.fft.irfft(spectrum, n_fft)[..., :n_out]
+
+
+def convolve_injection_history(pulse_response, injection_concs):
+    """
+    Response on the grid to injection_concs[k] held over [t_k, t_k+dt), via FFT.
+    Both arguments broadcast over leading axes; returns shape (..., n_steps).
+    """
+    injection_concs = np.asarray(injection_concs, dtype=np.float64)
+    pulse_response = np.asarray(pulse_response, dtype=np.float64)
+    n_steps = injection_concs.shape[-1]
+    if pulse_response.shape[-1] < n_steps:
+        raise ValueError("The pulse response must cover at least as many steps as the injection history.")
+    return _fft_convolve(injection_concs, pulse_response[..., :n_steps], n_steps)
+
+
+class StreamingConvolution:
+    """
+    Incremental convolution for injection samples arriving in blocks.
+
+    push(concentrations) takes the next samples on the grid and returns the responses at the
+    same grid times. Contributions beyond the pulse response length are dropped, so the pulse
+    response must cover the system memory.
+    """
+    def __init__(self, pulse_response):
+        self.pulse_response = np.asarray(pulse_response, dtype=np.float64)
+        self._pending = np.zeros(len(self.pulse_response) - 1)
+        self.n_samples = 0
+
+    def push(self, concentrations):
+        concentrations = np.atleast_1d(np.asarray(concentrations, dtype=np.float64))
+        m = len(concentrations)
+        n_total = m + len(self._pending)
+        total = _fft_convolve(concentrations, self.pulse_response, n_total)
+        total[:len(self._pending)] += self._pending
+        self._pending = total[m:]
+        self.n_samples += m
+        return total[:m]
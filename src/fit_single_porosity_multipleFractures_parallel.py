@@ -5,33 +5,47 @@ import pandas as pd
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 
-from simulation_options import simulateRoseNDSSinglePoro
-from sampling_algorithms import lhs_sample
-from metrics_options import least_squares_error, calcR2
-from Rose_data import nds_true_conc
+# run from the repository root: python -m src.fit_single_porosity_multipleFractures_parallel
+from .simulation_options import simulateRoseNDSSinglePoroMultiFracture, simulateRoseNDSSinglePoroMultiFractureBatch
+from .sampling_algorithms import lhs_sample
+from .metrics_options import least_squares_error, calcR2
+from .Rose_data import nds_true_conc
+from .instrumentation_options import state as instrumentation, submit_timed, record_task, export_stats
 
 # --- choose how many CPUs to use ---
-MAX_WORKERS = 120  # set this to the number of processes
+MAX_WORKERS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()  # available cores
+CHUNK_SIZE = 256   # iterations evaluated together as one batched simulation
+INSTRUMENTATION_FILE = 'instrumentation_stats.json'  # written when run with TRACER_INSTRUMENTATION=1
 
 # --- worker: runs one simulation and returns results ---
 def _run_one(it, mean_residence_time_1, peclet_number_1, fractional_recovery_1,
                  mean_residence_time_2, peclet_number_2):
-    prediction_1 = simulateRoseNDSSinglePoro(
-        mean_residence_time=mean_residence_time_1,
-        peclet_number=peclet_number_1
-    )
-    prediction_2 = simulateRoseNDSSinglePoro(
-        mean_residence_time=mean_residence_time_2,
-        peclet_number=peclet_number_2
-    )
-    
     fractional_recovery_2 = 1 - fractional_recovery_1
 
-    prediction = prediction_1 * fractional_recovery_1 + prediction_2 * fractional_recovery_2
+    # both fractures are combined in the Laplace domain and inverted once
+    prediction = simulateRoseNDSSinglePoroMultiFracture(
+        mean_residence_times=[mean_residence_time_1, mean_residence_time_2],
+        peclet_numbers=[peclet_number_1, peclet_number_2],
+        fractional_recoveries=[fractional_recovery_1, fractional_recovery_2]
+    )
     mse = least_squares_error(prediction, nds_true_conc, mean=True)
     r2_value = calcR2(prediction, nds_true_conc)
     return it, mse, r2_value
 
+# --- worker: runs a chunk of iterations as one batched simulation ---
+def _run_batch(its, mean_residence_time_1, peclet_number_1, fractional_recovery_1,
+                   mean_residence_time_2, peclet_number_2):
+    fractional_recovery_2 = 1 - np.asarray(fractional_recovery_1)
+
+    prediction = simulateRoseNDSSinglePoroMultiFractureBatch(
+        mean_residence_times=np.column_stack([mean_residence_time_1, mean_residence_time_2]),
+        peclet_numbers=np.column_stack([peclet_number_1, peclet_number_2]),
+        fractional_recoveries=np.column_stack([fractional_recovery_1, fractional_recovery_2])
+    )
+    mse = least_squares_error(prediction, nds_true_conc, mean=True)
+    r2_value = calcR2(prediction, nds_true_conc)
+    return its, mse, r2_value
+
 def main():
     # Sample the simulation experiments
     parameters = {
@@ -50,25 +64,33 @@ def main():
     mse_arr = np.empty(n, dtype=float)
     r2_arr  = np.empty(n, dtype=float)
 
-    # Build task list (one per iteration)
+    # Build task list (one per chunk of iterations)
+    columns = {name: np.asarray(values) for name, values in data_placeholder.items()}
     tasks = []
-    for it in data_placeholder['iteration']:
-        mrt_1  = data_placeholder['mean_residence_time_1'][it]
-        pec_1  = data_placeholder['peclet_number_1'][it]
-        mrt_2  = data_placeholder['mean_residence_time_2'][it]
-        pec_2  = data_placeholder['peclet_number_2'][it]
-        frec = data_placeholder['fractional_recovery'][it]
-        tasks.append((it, mrt_1, pec_1, mrt_2, pec_2, frec))
+    for start in range(0, n, CHUNK_SIZE):
+        its   = columns['iteration'][start:start + CHUNK_SIZE]
+        mrt_1 = columns['mean_residence_time_1'][its]
+        pec_1 = columns['peclet_number_1'][its]
+        mrt_2 = columns['mean_residence_time_2'][its]
+        pec_2 = columns['peclet_number_2'][its]
+        frec  = columns['fractional_recovery'][its]
+        tasks.append((its, mrt_1, pec_1, mrt_2, pec_2, frec))
 
     # Run in parallel with a single progress bar
     with ProcessPoolExecutor(max_workers=MAX_WORKERS) as exe:
-        futures = [exe.submit(_run_one, it, mrt_1, pec_1, frec, mrt_2, pec_2) for (it, mrt_1, pec_1, mrt_2, pec_2, frec) in tasks]
-        with tqdm(total=len(futures), desc='Simulating iterations ..', unit='iter', position=0, leave=True) as pbar:
+        submit = submit_timed if instrumentation.enabled else type(exe).submit
+        futures = [submit(exe, _run_batch, its, mrt_1, pec_1, frec, mrt_2, pec_2) for (its, mrt_1, pec_1, mrt_2, pec_2, frec) in tasks]
+        with tqdm(total=n, desc='Simulating iterations ..', unit='iter', position=0, leave=True) as pbar:
             for fut in as_completed(futures):
-                it, mse, r2_value = fut.result()
-                mse_arr[it] = mse
-                r2_arr[it]  = r2_value
-                pbar.update(1)
+                result = fut.result()
+                if instrumentation.enabled:
+                    # queue / execution time per chunk and the workers' node stats
+                    result, report = result
+                    record_task(report)
+                its, mse, r2_value = result
+                mse_arr[its] = mse
+                r2_arr[its]  = r2_value
+                pbar.update(len(its))
 
     # Assemble DataFrame and save
     data_placeholder['MSE'] = mse_arr.tolist()
@@ -76,6 +98,8 @@ def main():
 
     df = pd.DataFrame(data_placeholder)
     df.to_csv('SinglePorosityTwoFractureSimulationRuns.csv', index=False)
+    if instrumentation.enabled:
+        export_stats(INSTRUMENTATION_FILE)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+# Opt-in instrumentation of the model hot paths.
+#
+# When enabled, RELAP_Modifed records calls, time and transform evaluations (values of s)
+# per node, the inversions record how many time points they invert, and pool workers
+# report queue and execution time. Disabled, each hot path pays one attribute check.
+#
+#     with instrumented('stats.json'):
+#         simulateDualPorosity(...)
+#
+# TRACER_INSTRUMENTATION=1 in the environment enables it at import, so pool workers
+# started by an instrumented parent are instrumented too.
+
+INSTRUMENTATION_ENV = 'TRACER_INSTRUMENTATION'
+
+
+class _State:
+    enabled = os.environ.get(INSTRUMENTATION_ENV, '') not in ('', '0')
+
+state = _State()
+_stats = {}
+_hooks = []
+_lock = threading.Lock()
+
+
+def enable_instrumentation():
+    state.enabled = True
+    os.environ[INSTRUMENTATION_ENV] = '1'
+
+
+def disable_instrumentation():
+    state.enabled = False
+    os.environ.pop(INSTRUMENTATION_ENV, None)
+
+
+def reset_instrumentation():
+    with _lock:
+        _stats.clear()
+
+
+def add_hook(hook):
+    """
+    Call hook(name, seconds, counts) on every recorded event (e.g. to stream to a logger).
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def record(name, seconds, calls=1, **counts):
+    with _lock:
+        entry = _stats.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        entry['calls'] += calls
+        entry['seconds'] += seconds
+        for count, value in counts.items():
+            entry[count] = entry.get(count, 0) + value
+    for hook in _hooks:
+        hook(name, seconds, counts)
+
+
+def merge_stats(stats):
+    """
+    Add raw stats gathered elsewhere (e.g. returned by a worker process).
+    """
+    for name, entry in stats.items():
+        counts = {count: value for count, value in entry.items() if count not in ('calls', 'seconds')}
+        record(name, entry['seconds'], calls=entry['calls'], **counts)
+
+
+def raw_stats():
+    with _lock:
+        return {name: dict(entry) for name, entry in _stats.items()}
+
+
+def instrumentation_stats():
+    """
+    Aggregated stats: per entry calls, seconds and counts plus mean_seconds, and a summary with
+    transform evaluations per inverted time point and worker queue / execution totals.
+    """
+    stats = raw_stats()
+    for entry in stats.values():
+        entry['mean_seconds'] = entry['seconds'] / entry['calls'] if entry['calls'] else 0.0
+
+    summary = {}
+    inverted = sum(entry.get('time_points', 0) for name, entry in stats.items() if name.startswith('inversion.'))
+    if 'network' in stats and inverted:
+        summary['evaluations_per_time_point'] = stats['network']['evaluations'] / inverted
+    if 'worker.exec' in stats:
+        tasks = stats['worker.exec']['calls']
+        summary['tasks'] = tasks
+        summary['mean_queue_seconds'] = stats['worker.queue']['seconds'] / tasks
+        summary['mean_exec_seconds'] = stats['worker.exec']['seconds'] / tasks
+        summary['workers_seen'] = len([name for name in stats if name.startswith('worker.pid.')])
+    return {'entries': stats, 'summary': summary}
+
+
+def export_stats(path):
+    with open(path, 'w') as f:
+        json.dump(instrumentation_stats(), f, indent=2)
+
+
+@contextmanager
+def instrumented(path=None):
+    """
+    Enable and reset instrumentation for the block; write the aggregated stats to `path` at the end.
+    """
+    previous = state.enabled
+    reset_instrumentation()
+    enable_instrumentation()
+    try:
+        yield
+    finally:
+        if not previous:
+            disable_instrumentation()
+        if path is not None:
+            export_stats(path)
+
+
+# --- pool workers ---
+
+def submit_timed(executor, function, *args):
+    """
+    Submit function(*args) to a pool so its future returns (result, report); see run_timed.
+    """
+    return executor.submit(run_timed, function, time.time(), os.getpid(), *args)
+
+
+def run_timed(function, submitted, parent_pid, *args):
+    """
+    Worker side: run function(*args) and return (result, report) with the time spent queued
+    (wall clock since `submitted`), the execution time and, in a worker process with
+    instrumentation on, the node / inversion stats gathered during the task (thread workers
+    record into the parent's stats directly).
+    """
+    start = time.time()
+    collect = state.enabled and os.getpid() != parent_pid
+    if collect:
+        reset_instrumentation()
+    result = function(*args)
+    report = {
+        'queue': start - submitted,
+        'exec': time.time() - start,
+        'pid': os.getpid(),
+        'stats': raw_stats() if collect else {},
+    }
+    return result, report
+
+
+def record_task(report):
+    """
+    Parent side: account one run_timed report.
+    """
+    record('worker.queue', report['queue'])
+    record('worker.exec', report['exec'])
+    record(f"worker.pid.{report['pid']}", report['exec'])
+    merge_stats(report['stats'])
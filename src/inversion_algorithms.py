@@ -0,0 +1,325 @@
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import mpmath as mpm
+
+from . import instrumentation_options as _instrumentation
+
+
+# Default orders reproduce the mpmath settings used at dps = 8
+DEFAULT_ORDERS = {
+    'dehoog': 10,   # 2M+1 = 21 abscissae, same as mpmath.invertlaplace(..., method='dehoog') at dps=8
+    'talbot': 24,
+    'euler': 11,
+}
+
+
+def _order(method, order):
+    if method not in DEFAULT_ORDERS:
+        raise ValueError(f"Unknown inversion method '{method}'. Choose one of {list(DEFAULT_ORDERS)}.")
+    return DEFAULT_ORDERS[method] if order is None else int(order)
+
+
+# ---------------------------------------------------------------------------
+# de Hoog, Knight & Stokes (accelerated Fourier series)
+# ---------------------------------------------------------------------------
+
+def _dehoog_nodes(time_points, M):
+    t = np.asarray(time_points, dtype=np.float64)
+    dps_goal = int(1.38 * M)
+    alpha = 10.0 ** (-dps_goal)
+    tol = 10.0 * alpha
+    T = 2.0 * t
+    gamma = alpha - np.log(tol) / (2.0 * T)
+    k = np.arange(2 * M + 1)
+    p = gamma[:, None] + 1j * np.pi * k[None, :] / T[:, None]
+    return p, (gamma, T)
+
+
+def _dehoog_sum(fp, time_points, M, aux):
+    gamma, T = aux
+    t = np.asarray(time_points, dtype=np.float64)
+    # abscissae on the leading axis so every Q-D slice below is contiguous;
+    # the table is vectorized over the remaining axes (parameters, time points)
+    fp = np.ascontiguousarray(np.moveaxis(np.asarray(fp, dtype=np.complex128), -1, 0))
+
+    # (underflowed transforms at very early times give 0/0 and are mapped to 0 below)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        e_prev = np.zeros((2 * M + 1,) + fp.shape[1:], dtype=np.complex128)
+        q_prev = np.empty((2 * M,) + fp.shape[1:], dtype=np.complex128)
+        q_prev[0] = fp[1] / (fp[0] / 2)
+        q_prev[1:] = fp[2:2 * M + 1] / fp[1:2 * M]
+
+        d = [fp[0] / 2]
+        for r in range(1, M + 1):
+            mr = 2 * (M - r) + 1
+            e = q_prev[1:mr + 1] - q_prev[0:mr] + e_prev[1:mr + 1]
+            d.append(-q_prev[0])
+            d.append(-e[0])
+            if r != M:
+                q_prev = q_prev[1:mr] * e[1:mr] / e[0:mr - 1]
+            e_prev = e
+
+        # Pade recurrence for the continued fraction
+        z = np.exp(1j * np.pi * t / T)
+        A_prev, A = np.zeros_like(d[0]), d[0]
+        B_prev, B = np.ones_like(d[0]), np.ones_like(d[0])
+        for i in range(1, 2 * M):
+            A_prev, A = A, A + d[i] * A_prev * z
+            B_prev, B = B, B + d[i] * B_prev * z
+
+        # improved remainder
+        brem = (1 + (d[2 * M - 1] - d[2 * M]) * z) / 2
+        rem = brem * (np.sqrt(1 + d[2 * M] * z / brem) - 1)
+        A = A + rem * A_prev
+        B = B + rem * B_prev
+
+        result = np.exp(gamma * t) / T * (A / B).real
+    return np.nan_to_num(result, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+# ---------------------------------------------------------------------------
+# Fixed Talbot (Abate & Valko, 2004)
+# The contour runs into the left half-plane, so transforms containing a time
+# shift exp(-s*T) (pulse ends, pipeline delay) overflow on it; the summation
+# rejects such transforms instead of returning NaN.
+# ---------------------------------------------------------------------------
+
+def _talbot_nodes(time_points, M):
+    t = np.asarray(time_points, dtype=np.float64)
+    r = 2.0 * M / 5.0
+    theta = np.pi * np.arange(M) / M
+    cot_theta = np.zeros(M)
+    cot_theta[1:] = 1.0 / np.tan(theta[1:])
+    delta = np.empty(M, dtype=np.complex128)
+    delta[0] = r
+    delta[1:] = r * theta[1:] * (cot_theta[1:] + 1j)
+    weights = np.exp(delta) * (1 + 1j * theta * (1 + cot_theta ** 2) - 1j * cot_theta)
+    weights[0] = np.exp(delta[0]) / 2
+    p = delta[None, :] / t[:, None]
+    return p, weights
+
+
+def _talbot_sum(fp, time_points, M, weights):
+    if not np.all(np.isfinite(fp)):
+        raise ValueError(
+            "Transform is not finite on the Talbot contour (time shifts exp(-s*T) such as pulse "
+            "ends or a pipeline delay overflow there); use method='dehoog' or 'euler'.")
+    t = np.asarray(time_points, dtype=np.float64)
+    return 0.4 / t * np.sum(weights * fp, axis=-1).real
+
+
+# ---------------------------------------------------------------------------
+# Euler summation (Abate & Whitt, 2006)
+# ---------------------------------------------------------------------------
+
+def _euler_nodes(time_points, M):
+    t = np.asarray(time_points, dtype=np.float64)
+    k = np.arange(2 * M + 1)
+    beta = M * np.log(10.0) / 3.0 + 1j * np.pi * k
+
+    xi = np.ones(2 * M + 1)
+    xi[0] = 0.5
+    xi[2 * M] = 2.0 ** (-M)
+    binom = 1.0
+    for j in range(1, M):
+        binom = binom * (M - j + 1) / j
+        xi[2 * M - j] = xi[2 * M - j + 1] + 2.0 ** (-M) * binom
+    eta = 10.0 ** (M / 3.0) * (-1.0) ** k * xi
+
+    p = beta[None, :] / t[:, None]
+    return p, eta
+
+
+def _euler_sum(fp, time_points, M, eta):
+    t = np.asarray(time_points, dtype=np.float64)
+    return np.sum(eta * fp.real, axis=-1) / t
+
+
+_METHODS = {
+    'dehoog': (_dehoog_nodes, _dehoog_sum),
+    'talbot': (_talbot_nodes, _talbot_sum),
+    'euler': (_euler_nodes, _euler_sum),
+}
+
+
+# ---------------------------------------------------------------------------
+# Inversion plans - abscissae and weights built once per (time grid, method, order)
+# ---------------------------------------------------------------------------
+
+PLAN_CACHE_SIZE = 32        # plans kept by get_inversion_plan
+NODE_CACHE_SIZE = 16        # parameter-independent node evaluations kept per plan
+
+
+class _LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        # built outside the lock; if two threads race, both values are equal and the first one is kept
+        value = build()
+        with self._lock:
+            value = self._items.setdefault(key, value)
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class _CachedNode:
+    # returns the stored values when evaluated on the plan abscissae, otherwise defers to the node
+    def __init__(self, node, abscissae, values):
+        self.node = node
+        self.abscissae = abscissae
+        self.values = values
+
+    def __call__(self, s):
+        if s is self.abscissae:
+            return self.values
+        return self.node(s)
+
+
+class InversionPlan:
+    """
+    Reusable inversion setup for one (time grid, method, order).
+
+    abscissae : complex128 array (n_times, n_abscissae) at which the transform is evaluated
+    invert(fp): time-domain values from transform values fp of shape (..., n_times, n_abscissae)
+    """
+    def __init__(self, time_points, method='dehoog', order=None):
+        self.method = method
+        self.order = _order(method, order)
+        self.time_points = np.array(time_points, dtype=np.float64)
+        self.time_points.flags.writeable = False
+
+        nodes, self._summation = _METHODS[method]
+        self.abscissae, self._aux = nodes(self.time_points, self.order)
+        self.abscissae.flags.writeable = False
+        self._node_values = _LRUCache(NODE_CACHE_SIZE)
+
+    def cached_node(self, node, key):
+        """
+        Wrap a parameter-independent node (e.g. the injection input function) so its
+        values on the plan abscissae are computed once per `key` and reused.
+        """
+        values = self._node_values.get(key, lambda: node(self.abscissae))
+        return _CachedNode(node, self.abscissae, values)
+
+    def invert(self, fp):
+        fp = np.asarray(fp, dtype=np.complex128)
+        if _instrumentation.state.enabled:
+            start = time.perf_counter()
+            values = self._summation(fp, self.time_points, self.order, self._aux)
+            # one time point per row of abscissae, over every leading (parameter) axis
+            _instrumentation.record(f'inversion.{self.method}', time.perf_counter() - start,
+                                    time_points=fp.size // fp.shape[-1])
+            return values
+        return self._summation(fp, self.time_points, self.order, self._aux)
+
+
+_plan_cache = _LRUCache(PLAN_CACHE_SIZE)
+
+
+def get_inversion_plan(time_points, method='dehoog', order=None):
+    """
+    Shared InversionPlan for a time grid, built on first use and kept in a bounded LRU cache.
+    """
+    time_points = np.ascontiguousarray(time_points, dtype=np.float64)
+    M = _order(method, order)
+    key = (time_points.tobytes(), method, M)
+    return _plan_cache.get(key, lambda: InversionPlan(time_points, method, M))
+
+
+def clear_inversion_plans():
+    _plan_cache.clear()
+
+
+def invert_laplace(F, time_points, method='dehoog', order=None, plan=None):
+    """
+    Vectorized float64 numerical inverse Laplace transform.
+
+    F           : callable accepting a complex128 array of s and returning an array of the same shape
+                  (or with extra leading axes, e.g. one per parameter set)
+    time_points : 1-D array of times (> 0)
+    method      : 'dehoog', 'talbot' or 'euler' ('talbot' raises ValueError for transforms with
+                  time shifts such as injection pulses, which overflow on its contour)
+    order       : approximation order (defaults in DEFAULT_ORDERS)
+    plan        : optional InversionPlan for time_points; method and order are then taken from the plan
+
+    returns: float64 array of f(t) at time_points
+    """
+    if plan is None:
+        plan = get_inversion_plan(time_points, method, order)
+    return plan.invert(F(plan.abscissae))
+
+
+def invert_laplace_mpmath(F, time_points, method='dehoog', dps=8):
+    """
+    Reference inversion with mpmath.invertlaplace, one time point at a time.
+
+    Runs in a private mpmath context at `dps` digits, so the global mpmath.mp precision is
+    never touched and concurrent calls with different precisions do not interfere.
+    """
+    ctx = mpm.MPContext()
+    ctx.dps = dps
+    start = time.perf_counter()
+    values = [ctx.invertlaplace(F, time_point, method=method) for time_point in time_points]
+    if _instrumentation.state.enabled:
+        _instrumentation.record('inversion.mpmath', time.perf_counter() - start, time_points=len(values))
+    return np.array(values, dtype=np.float64)
+
+
+# ---------------------------------------------------------------------------
+# Error-controlled inversion - float64 everywhere, extra precision only where needed
+# ---------------------------------------------------------------------------
+
+ADAPTIVE_ORDER_STEP = 4     # float64 error estimate: order M against order M + ADAPTIVE_ORDER_STEP
+ADAPTIVE_DPS_STEP = 10      # precision increment for points escalated to mpmath
+
+
+def invert_laplace_adaptive(F, time_points, method='dehoog', order=None, rtol=1e-6, atol=1e-10, max_dps=45):
+    """
+    Inverse Laplace transform with a per-point error estimate.
+
+    Every point is first inverted in float64 at orders M and M + ADAPTIVE_ORDER_STEP; the
+    difference is the error estimate. Points where it exceeds atol + rtol*|f| are re-inverted
+    with mpmath de Hoog at 15, 25, ... digits (up to max_dps), each estimate being the change
+    from the previous level. F must accept complex128 arrays and single mpmath values
+    (RELAP networks do) and describe one curve, without leading parameter axes.
+
+    returns: values, error estimates and the mpmath digits used (0 for float64) per time point
+    """
+    t = np.asarray(time_points, dtype=np.float64)
+    M = _order(method, order)
+    values = invert_laplace(F, t, method=method, order=M + ADAPTIVE_ORDER_STEP)
+    if values.shape != t.shape:
+        raise ValueError("invert_laplace_adaptive handles one curve; F returned leading parameter axes.")
+    error = np.abs(values - invert_laplace(F, t, method=method, order=M))
+    dps = np.zeros(t.shape, dtype=int)
+
+    # Talbot cannot follow exp(-s*T) shifts, so escalated points always use de Hoog
+    level = 15
+    pending = error > atol + rtol * np.abs(values)
+    while np.any(pending) and level <= max_dps:
+        refined = invert_laplace_mpmath(F, t[pending], method='dehoog', dps=level)
+        error[pending] = np.abs(refined - values[pending])
+        values[pending] = refined
+        dps[pending] = level
+        pending = error > atol + rtol * np.abs(values)
+        level += ADAPTIVE_DPS_STEP
+    return values, error, dps
@@ -0,0 +1,22 @@
+import numpy as np
+
+
+def least_squares_error(prediction, true_values, mean=False):
+    """
+    Sum (or mean, if `mean`) of squared residuals along the last axis, so a
+    (n_samples, n_times) matrix of predictions gives one value per sample.
+    """
+    residuals = np.asarray(prediction, dtype=float) - np.asarray(true_values, dtype=float)
+    if mean:
+        return np.mean(residuals ** 2, axis=-1)
+    return np.sum(residuals ** 2, axis=-1)
+
+
+def calcR2(prediction, true_values):
+    """
+    Coefficient of determination along the last axis.
+    """
+    true_values = np.asarray(true_values, dtype=float)
+    ss_res = np.sum((true_values - np.asarray(prediction, dtype=float)) ** 2, axis=-1)
+    ss_tot = np.sum((true_values - np.mean(true_values, axis=-1, keepdims=True)) ** 2, axis=-1)
+    return 1 - ss_res / ss_tot
@@ -0,0 +1,165 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.integrate import cumulative_trapezoid, cumulative_simpson
+
+
+# Residence-time distribution (RTD) analysis of produced tracer data.
+#
+# The notebooks integrate np.interp interpolants with scipy.integrate.quad, one quad
+# call per moment. Here every moment of every tracer is a column of one cumulative
+# integral over the sample times, so the integral over any window [a, b] is a
+# difference of cumulative values, and many tracers and windows cost one pass.
+
+RATE_HISTORY_FILE = os.path.join(
+    os.path.dirname(__file__), '..', 'data', 'derived', 'utah_forge_gdr1683_extracted.csv')
+
+# (mg/L) * (bbl/min) -> kg/min: 42 gal/bbl, 3.78 L/gal, 1e6 mg/kg
+MASS_CONVERSION = 42 * 3.78 / 1e6
+
+INTEGRATION_RULES = ('trapezoid', 'simpson')
+
+
+def load_rate_history(path=RATE_HISTORY_FILE):
+    """
+    Production rate history (time in min, rate in bpm) from the derived GDR extract.
+    """
+    df = pd.read_csv(path).dropna(subset=['Time, min', 'Production Rate, bpm'])
+    return df['Time, min'].to_numpy(dtype=np.float64), df['Production Rate, bpm'].to_numpy(dtype=np.float64)
+
+
+def _cumulative(x, y, rule):
+    # cumulative integral along the last axis, starting at 0
+    if rule == 'trapezoid' or len(x) < 3:
+        return cumulative_trapezoid(y, x, axis=-1, initial=0)
+    return cumulative_simpson(y, x=x, axis=-1, initial=0)
+
+
+def _integral_at(x, y, cumulative, points):
+    # cumulative integral at arbitrary points: the value at the node below plus the
+    # trapezoid over the part of the interval, i.e. exact for the linear interpolant
+    points = np.clip(points, x[0], x[-1])
+    i = np.clip(np.searchsorted(x, points, side='right') - 1, 0, len(x) - 2)
+    h = points - x[i]
+    y_point = y[..., i] + (y[..., i + 1] - y[..., i]) * h / (x[i + 1] - x[i])
+    return cumulative[..., i] + h * (y[..., i] + y_point) / 2
+
+
+def cumulative_volume(time_points, rates, rate_times=None):
+    """
+    Produced volume at `time_points`, integrated over the whole rate history.
+
+    rates: constant rate, rates on `time_points`, or a history sampled at `rate_times`
+    """
+    time_points = np.asarray(time_points, dtype=np.float64)
+    if rate_times is None:
+        if np.ndim(rates) == 0:
+            return rates * time_points
+        rate_times = time_points
+    rate_times = np.asarray(rate_times, dtype=np.float64)
+    rates = np.asarray(rates, dtype=np.float64)
+    volume = cumulative_trapezoid(rates, rate_times, initial=0) + rate_times[0] * rates[0]
+    return _integral_at(rate_times, rates, volume, time_points)
+
+
+def rolling_windows(t_start, t_end, width, step):
+    """
+    (n_windows, 2) array of [start, end] windows of length `width` every `step`.
+    """
+    starts = np.arange(t_start, t_end - width + step / 2, step, dtype=np.float64)
+    return np.column_stack([starts, np.minimum(starts + width, t_end)])
+
+
+def rtd_moments(time_points, rtd, windows=None, rule='trapezoid', volumes=None):
+    """
+    Moments of residence-time distributions over time windows.
+
+    time_points: (n_times,) increasing sample times
+    rtd        : (..., n_times) RTD values, any number of leading axes (tracers, ...)
+    windows    : (n_windows, 2) [start, end] pairs; None for the whole record
+    rule       : 'trapezoid' (exactly the notebooks' quad of np.interp) or 'simpson'
+                 (composite Simpson between the nodes; partial intervals at window edges
+                 use the trapezoid)
+    volumes    : (n_times,) produced volume at the sample times, for volume moments
+
+    returns: {"recovery_factor", "mean_residence_time", "variance"[, "mean_residence_volume"]},
+             each (..., n_windows), or (...) when windows is None
+    """
+    if rule not in INTEGRATION_RULES:
+        raise ValueError(f"Unknown integration rule '{rule}'. Choose one of {list(INTEGRATION_RULES)}.")
+    t = np.asarray(time_points, dtype=np.float64)
+    rtd = np.asarray(rtd, dtype=np.float64)
+    whole_record = windows is None
+    windows = np.array([[t[0], t[-1]]]) if whole_record else np.atleast_2d(np.asarray(windows, dtype=np.float64))
+
+    # integrands stacked on axis -2: E, t*E, t^2*E[, V*E]
+    integrands = [rtd, t * rtd, t ** 2 * rtd]
+    if volumes is not None:
+        integrands.append(np.asarray(volumes, dtype=np.float64) * rtd)
+    integrands = np.stack(np.broadcast_arrays(*integrands), axis=-2)
+    cumulative = _cumulative(t, integrands, rule)
+    integrals = (_integral_at(t, integrands, cumulative, windows[:, 1])
+                 - _integral_at(t, integrands, cumulative, windows[:, 0]))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recovery = integrals[..., 0, :]
+        mean_time = integrals[..., 1, :] / recovery
+        moments = {
+            'recovery_factor': recovery,
+            'mean_residence_time': mean_time,
+            'variance': integrals[..., 2, :] / recovery - mean_time ** 2,
+        }
+        if volumes is not None:
+            moments['mean_residence_volume'] = integrals[..., 3, :] / recovery
+    if whole_record:
+        moments = {name: values[..., 0] for name, values in moments.items()}
+    return moments
+
+
+def residence_time_analysis(
+        time_points,
+        concentrations,
+        rates,
+        rate_times=None,
+        windows=None,
+        rule='trapezoid',
+        conversion=MASS_CONVERSION):
+    """
+    RTD metrics of produced tracer concentrations under a constant or variable production rate.
+
+    time_points   : (n_times,) tracer sample times
+    concentrations: (..., n_times) normalized concentrations, e.g. (n_tracers, n_times)
+    rates         : constant rate, rates on `time_points`, or a history sampled at `rate_times`
+                    (see load_rate_history)
+    windows       : (n_windows, 2) [start, end] pairs (see rolling_windows); None for the whole record
+
+    The RTD is E(t) = C(t) * q(t) * conversion. Volumes are the produced volume integrated over
+    the rate history; the notebooks' t * q(t) matches it only at constant rate.
+
+    returns: rtd_moments(...) plus "modal_volume" (produced volume at the peak of E / q in each
+             window) and the "rtd" and "volume" samples
+    """
+    t = np.asarray(time_points, dtype=np.float64)
+    concentrations = np.asarray(concentrations, dtype=np.float64)
+    if rate_times is None:
+        q = np.broadcast_to(np.asarray(rates, dtype=np.float64), t.shape)
+    else:
+        q = np.interp(t, rate_times, rates, left=rates[0], right=rates[-1])
+    volume = cumulative_volume(t, rates, rate_times)
+    rtd = concentrations * q * conversion
+
+    results = rtd_moments(t, rtd, windows=windows, rule=rule, volumes=volume)
+
+    # peak of the volume-based RTD E / q inside each window
+    residence_volume = rtd / q
+    bounds = np.array([[t[0], t[-1]]]) if windows is None else np.atleast_2d(np.asarray(windows, dtype=np.float64))
+    first = np.searchsorted(t, bounds[:, 0], side='left')
+    last = np.searchsorted(t, bounds[:, 1], side='right')
+    modal = np.full(rtd.shape[:-1] + (len(bounds),), np.nan)
+    for w, (i, j) in enumerate(zip(first, last)):
+        if j > i:
+            modal[..., w] = volume[i + np.argmax(residence_volume[..., i:j], axis=-1)]
+    results['modal_volume'] = modal[..., 0] if windows is None else modal
+    results['rtd'] = rtd
+    results['volume'] = volume
+    return results
@@ -1,5 +1,7 @@
 import os
+import warnings
 import numpy as np
+from scipy.stats import qmc
 from typing import Dict, List, Tuple
 
 def lhs_sample(params: Dict[str, Tuple[float, float]], n: int, seed: int = None) -> Dict[str, List[float]]:
@@ -40,4 +42,186 @@ def lhs_sample(params: Dict[str, Tuple[float, float]], n: int, seed: int = None)
     return out
 
 
+# --- array-native designs ---
+#
+# Designs are generated as (n, d) float arrays in [0, 1) and scaled column by column,
+# optionally log-uniformly (e.g. Peclet 1-100). 'lhs', 'sobol' and 'halton' rows can be
+# generated for any index range [start, stop) of an n-point design, so sample_chunks
+# streams 10^6-10^7 point designs chunk by chunk with the same values as sample(...):
+# the LHS strata come from a keyed Feistel permutation of 0..n-1 per column and the
+# in-stratum offsets from a keyed hash of the row index, so no O(n) state is kept.
+# 'maximin_lhs' improves an LHS by coordinate swaps and needs the whole design.
 
+SAMPLING_METHODS = ('lhs', 'maximin_lhs', 'sobol', 'halton')
+FEISTEL_ROUNDS = 4
+MAXIMIN_P = 50      # Morris-Mitchell phi_p exponent; large p approaches the maximin criterion
+
+
+def _mix64(x):
+    # splitmix64 finalizer on uint64 arrays (wrapping arithmetic)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _column_keys(seed, d):
+    # per column: FEISTEL_ROUNDS permutation keys and one offset key
+    state = np.random.SeedSequence(seed).generate_state(d * (FEISTEL_ROUNDS + 1), dtype=np.uint64)
+    return state.reshape(d, FEISTEL_ROUNDS + 1)
+
+
+def _permute(index, n, keys):
+    # keyed bijection of 0..n-1: Feistel network on 2h bits, cycle-walking back into range
+    h = np.uint64(max(1, (int(n - 1).bit_length() + 1) // 2))
+    mask = (np.uint64(1) << h) - np.uint64(1)
+    x = index.copy()
+    todo = np.ones(len(x), dtype=bool)
+    while todo.any():
+        left, right = x[todo] >> h, x[todo] & mask
+        for key in keys:
+            left, right = right, left ^ (_mix64(right ^ key) & mask)
+        x[todo] = (left << h) | right
+        todo = x >= np.uint64(n)
+    return x
+
+
+def _lhs_rows(n, d, start, stop, seed):
+    index = np.arange(start, stop, dtype=np.uint64)
+    unit = np.empty((stop - start, d), dtype=np.float64)
+    for j, keys in enumerate(_column_keys(seed, d)):
+        strata = _permute(index, n, keys[:FEISTEL_ROUNDS])
+        offset = (_mix64(index ^ keys[FEISTEL_ROUNDS]) >> np.uint64(11)) * 2.0 ** -53
+        unit[:, j] = (strata + offset) / n
+    return unit
+
+
+def _qmc_engine(engine, d, seed):
+    try:
+        return engine(d, scramble=True, rng=seed)
+    except TypeError:
+        # scipy < 1.15
+        return engine(d, scramble=True, seed=seed)
+
+
+def _qmc_rows(engine, d, start, stop, seed):
+    sampler = _qmc_engine(engine, d, seed)
+    if start:
+        sampler.fast_forward(start)
+    with warnings.catch_warnings():
+        # Sobol' balance holds for powers of two; chunks of other sizes are still valid points
+        warnings.filterwarnings('ignore', message='The balance properties of Sobol')
+        return sampler.random(stop - start)
+
+
+def _maximin(unit, seed, iterations):
+    """
+    Coordinate-swap search minimizing phi_p = sum d_ij^-p: each step swaps one coordinate of
+    a point (chosen with probability proportional to its phi_p share) with another point,
+    which keeps the Latin hypercube property, and keeps the swap if phi_p decreases.
+    """
+    n, d = unit.shape
+    if n < 3:
+        return unit
+    rng = np.random.default_rng(seed)
+    x = unit.copy()
+    scale = n ** (1 / d)    # distances in units of the typical spacing keep d^-p finite
+
+    def terms(i):
+        distance = np.sqrt(np.sum((x - x[i]) ** 2, axis=1)) * scale
+        distance[i] = np.inf
+        return distance ** -MAXIMIN_P
+
+    share = np.empty(n)
+    for step in range(iterations):
+        if step % n == 0:
+            # incremental updates of terms spanning many decades lose precision; refresh them
+            for i in range(n):
+                share[i] = terms(i).sum()
+        i = rng.choice(n, p=share / share.sum())
+        r = (i + rng.integers(1, n)) % n
+        k = rng.integers(d)
+        old_i, old_r = terms(i), terms(r)
+        x[[i, r], k] = x[[r, i], k]
+        new_i, new_r = terms(i), terms(r)
+        # d_ir is unchanged by a swap of one coordinate
+        if new_i.sum() + new_r.sum() < old_i.sum() + old_r.sum():
+            share = np.maximum(share + (new_i - old_i) + (new_r - old_r), 0.0)
+            share[i], share[r] = new_i.sum(), new_r.sum()
+        else:
+            x[[i, r], k] = x[[r, i], k]
+    return x
+
+
+def unit_design(method, n, d, start=0, stop=None, seed=None, iterations=None):
+    """
+    Rows [start, stop) of an n-point design in [0, 1)^d as an array (stop - start, d).
+    `seed` must be fixed (not None) for rows of one design drawn in several calls.
+    """
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method '{method}'. Choose one of {list(SAMPLING_METHODS)}.")
+    if n <= 0:
+        raise ValueError("n must be a positive integer.")
+    stop = n if stop is None else stop
+    if method == 'lhs':
+        return _lhs_rows(n, d, start, stop, seed)
+    if method == 'maximin_lhs':
+        if (start, stop) != (0, n):
+            raise ValueError("maximin_lhs optimizes the whole design and cannot be generated in chunks.")
+        iterations = min(20 * n, 20000) if iterations is None else iterations
+        return _maximin(_lhs_rows(n, d, 0, n, seed), seed, iterations)
+    engine = qmc.Sobol if method == 'sobol' else qmc.Halton
+    return _qmc_rows(engine, d, start, stop, seed)
+
+
+def scale_design(unit, params, log_scale=()):
+    """
+    Map unit-cube columns onto the ranges in `params` (in order); names in `log_scale` are
+    sampled uniformly in log space.
+
+    returns: {"param_name": array, ...}
+    """
+    columns = {}
+    for j, (name, (lo, hi)) in enumerate(params.items()):
+        if hi < lo:
+            raise ValueError(f"Range for '{name}' must satisfy min <= max.")
+        if name in log_scale:
+            if lo <= 0:
+                raise ValueError(f"Log-uniform range for '{name}' must be positive.")
+            columns[name] = np.exp(np.log(lo) + unit[:, j] * (np.log(hi) - np.log(lo)))
+        else:
+            columns[name] = lo + unit[:, j] * (hi - lo)
+    return columns
+
+
+def sample_rows(params, n, start, stop, method='lhs', seed=None, log_scale=()):
+    """
+    Rows [start, stop) of an n-point design as {"iteration": array, "param_name": array, ...}.
+    """
+    unit = unit_design(method, n, len(params), start, stop, seed=seed)
+    return dict(iteration=np.arange(start, stop), **scale_design(unit, params, log_scale))
+
+
+def sample(params, n, method='lhs', seed=None, log_scale=(), iterations=None):
+    """
+    n-point space-filling design over the ranges in `params`, as NumPy arrays.
+
+    params   : {"param_name": [min, max], ...}
+    method   : 'lhs', 'maximin_lhs', 'sobol' (scrambled) or 'halton' (scrambled)
+    log_scale: names sampled log-uniformly
+    iterations: swap steps for 'maximin_lhs' (default min(20 n, 20000))
+
+    returns: {"iteration": array, "param_name": array, ...}
+    """
+    unit = unit_design(method, n, len(params), seed=seed, iterations=iterations)
+    return dict(iteration=np.arange(n), **scale_design(unit, params, log_scale))
+
+
+def sample_chunks(params, n, chunk_size, method='lhs', seed=None, log_scale=()):
+    """
+    Generator of consecutive chunks of sample(params, n, method, seed, log_scale), for designs
+    too large to hold in memory. Not available for 'maximin_lhs'.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    for start in range(0, n, chunk_size):
+        yield sample_rows(params, n, start, min(start + chunk_size, n), method, seed, log_scale)
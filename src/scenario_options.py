@@ -0,0 +1,240 @@
+import numbers
+import itertools
+import numpy as np
+import pandas as pd
+
+from .RELAP_v4 import GroundWaterInfiniteMatrixSolution, Recirculation, WellboreStorage, PipelineDelay
+from .inversion_algorithms import get_inversion_plan
+from .simulation_options import _injection_node
+
+
+# Scenario matrices: a Cartesian product of flow parameters and injection schedules.
+#
+# The groundwater kernel (with recirculation, wellbore storage and pipeline delay)
+# depends only on the flow parameters and the input node only on the schedule, so
+# each is evaluated once on the shared abscissae and the two are multiplied by
+# broadcasting: kernels (n_flow, 1, n_times, K) x inputs (n_schedules, n_times, K).
+# Recirculation F = L / (1 - r*L) is not linear in the loop transform L, so flow paths
+# that share a recirculation loop are blended in the Laplace domain (paths=...), before
+# recirculation; ScenarioResult.mix only blends curves without recirculation.
+
+FLOW_PARAMETERS = {
+    # name: default when the parameter is not a scenario dimension
+    'mean_residence_time': None,
+    'peclet_number': None,
+    'frac_retard': 1.0,
+    'dualPorosity_param': 0.0,
+    'matrix_retardation': 1.0,
+    'recRatio': 0.0,
+    'wsCoef': 0.0,
+    'delay_time': 0.0,
+}
+
+
+class ScenarioResult:
+    """
+    Labeled N-d array of concentrations.
+
+    values  : ndarray with one axis per flow dimension, then 'schedule', then 'time'
+    dims    : axis names
+    coords  : {dim: labels}
+    recRatio: recirculation ratio of every value (broadcastable to values; default 0)
+    """
+    def __init__(self, values, dims, coords, recRatio=0.0):
+        self.values = values
+        self.dims = tuple(dims)
+        self.coords = dict(coords)
+        self.recRatio = np.broadcast_to(np.asarray(recRatio, dtype=np.float64), np.shape(values))
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _axis(self, dim):
+        if dim not in self.dims:
+            raise KeyError(f"No dimension '{dim}'. Dimensions are {list(self.dims)}.")
+        return self.dims.index(dim)
+
+    def _index(self, dim, label):
+        labels = self.coords[dim]
+        for i, value in enumerate(labels):
+            if isinstance(value, numbers.Real) and isinstance(label, numbers.Real):
+                if np.isclose(value, label):
+                    return i
+            elif value == label:
+                return i
+        raise KeyError(f"No label {label!r} on dimension '{dim}'.")
+
+    def sel(self, **labels):
+        """
+        Select one label on each given dimension; the selected dimensions are dropped.
+        """
+        index = [slice(None)] * len(self.dims)
+        for dim, label in labels.items():
+            index[self._axis(dim)] = self._index(dim, label)
+        dims = [dim for dim in self.dims if dim not in labels]
+        return ScenarioResult(
+            self.values[tuple(index)], dims, {dim: self.coords[dim] for dim in dims}, self.recRatio[tuple(index)])
+
+    def mix(self, dim, weights, bckgrnd_conc):
+        """
+        Blend along `dim` with fractional recoveries `weights` (concentrations above
+        background add linearly), e.g. two flow paths into one produced curve. Only valid
+        without recirculation; paths sharing a recirculation loop are blended with
+        simulateScenarioMatrix(..., paths=(dim, weights)).
+        """
+        if np.any(self.recRatio != 0):
+            raise ValueError("mix cannot blend curves with recirculation (recRatio != 0); "
+                             "use simulateScenarioMatrix(..., paths=(dim, weights)).")
+        axis = self._axis(dim)
+        weights = np.asarray(weights, dtype=np.float64)
+        relative = np.moveaxis(self.values - bckgrnd_conc, axis, 0)
+        values = bckgrnd_conc + np.tensordot(weights, relative, axes=1)
+        dims = [d for d in self.dims if d != dim]
+        return ScenarioResult(values, dims, {d: self.coords[d] for d in dims})
+
+    def to_frame(self):
+        """
+        Wide DataFrame: a 'time' column and one column per scenario named 'dim=label__dim=label'.
+        """
+        columns = {'time': np.asarray(self.coords['time'])}
+        scenario_dims = self.dims[:-1]
+        for index in itertools.product(*[range(len(self.coords[dim])) for dim in scenario_dims]):
+            name = '__'.join(f'{dim}={_format_label(self.coords[dim][i])}' for dim, i in zip(scenario_dims, index))
+            columns[name] = self.values[index]
+        return pd.DataFrame(columns)
+
+
+def _format_label(label):
+    if isinstance(label, (float, np.floating)):
+        return f'{label:g}'
+    return str(label)
+
+
+def _flow_axes(flow_parameters):
+    # one dimension per entry; a dict entry zips several parameters onto one dimension
+    dims, coords, columns = [], {}, []
+    for dim, values in flow_parameters.items():
+        if isinstance(values, dict):
+            lengths = {len(v) for v in values.values()}
+            if len(lengths) != 1:
+                raise ValueError(f"Parameters zipped on dimension '{dim}' need equal lengths.")
+            names, n = list(values), lengths.pop()
+            coords[dim] = list(range(n))
+            columns.append({name: np.asarray(values[name], dtype=np.float64) for name in names})
+        else:
+            n = len(values)
+            coords[dim] = list(values)
+            columns.append({dim: np.asarray(values, dtype=np.float64)})
+        for name in columns[-1]:
+            if name not in FLOW_PARAMETERS:
+                raise ValueError(f"Unknown flow parameter '{name}'. Choose from {list(FLOW_PARAMETERS)}.")
+        dims.append(dim)
+    return dims, coords, columns
+
+
+def simulateScenarioMatrix(
+        flow_parameters,
+        schedules,
+        time_points,
+        bckgrnd_conc,
+        method='dehoog',
+        order=None,
+        chunk_size=64,
+        plan=None,
+        paths=None,
+        **fixed_parameters):
+    """
+    flow_parameters : {dim: values} - each entry is a scenario dimension, e.g.
+                      {"frac_retard": [1.5, 3.5]}; {dim: {name: values, ...}} zips several
+                      parameters onto one dimension, e.g. two flow paths:
+                      {"path": {"mean_residence_time": [m1, m2], "peclet_number": [p1, p2]}}
+    schedules       : {label: (inj_concs, inj_durs)} injection schedules (the 'schedule' dimension)
+    paths           : optional (dim, fractional recoveries): blend the flow paths along `dim` in
+                      the Laplace domain, inside the recirculation loop (recRatio, wsCoef and
+                      delay_time are then shared by the paths); `dim` is not in the result
+    fixed_parameters: values for flow parameters that are not dimensions (see FLOW_PARAMETERS)
+
+    returns: ScenarioResult with dims (*flow dims, 'schedule', 'time')
+    """
+    if plan is None:
+        plan = get_inversion_plan(time_points, method, order)
+    dims, coords, columns = _flow_axes(flow_parameters)
+    n_paths = 1
+    if paths is not None:
+        path_dim, path_weights = paths
+        if path_dim not in dims:
+            raise KeyError(f"No dimension '{path_dim}'. Dimensions are {list(dims)}.")
+        # the path dimension goes last, so consecutive flattened scenarios are one blend's paths
+        position = dims.index(path_dim)
+        dims.append(dims.pop(position))
+        columns.append(columns.pop(position))
+        path_weights = np.asarray(path_weights, dtype=np.float64)
+        n_paths = len(coords[path_dim])
+        if path_weights.shape != (n_paths,):
+            raise ValueError(f"paths needs one weight per label of '{path_dim}' ({n_paths}).")
+        chunk_size = -(-chunk_size // n_paths) * n_paths
+
+    # Cartesian product of the flow dimensions, flattened to one leading axis
+    shape = [len(coords[dim]) for dim in dims]
+    grids = np.meshgrid(*[np.arange(n) for n in shape], indexing='ij')
+    params = {}
+    for grid, group in zip(grids, columns):
+        for name, values in group.items():
+            params[name] = values[grid.ravel()]
+    n_flow = int(np.prod(shape))
+    for name, default in FLOW_PARAMETERS.items():
+        if name not in params:
+            value = fixed_parameters.pop(name, default)
+            if value is None:
+                raise ValueError(f"'{name}' must be a scenario dimension or a fixed parameter.")
+            params[name] = np.full(n_flow, value, dtype=np.float64)
+    if fixed_parameters:
+        raise TypeError(f"Unexpected parameters {list(fixed_parameters)}.")
+
+    # each schedule's input node once on the plan abscissae: (n_schedules, n_times, K)
+    labels = list(schedules)
+    inputs = []
+    for label in labels:
+        inj_concs, inj_durs = (np.asarray(v, dtype=np.float64) for v in schedules[label])
+        inputs.append(_injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)(plan.abscissae))
+    inputs = np.stack(inputs)
+
+    if paths is not None and np.any(np.ptp(params['recRatio'].reshape(-1, n_paths), axis=1) != 0):
+        raise ValueError("Paths blended in one recirculation loop need the same recRatio.")
+
+    s = plan.abscissae
+    values = np.empty((n_flow // n_paths, len(labels), len(plan.time_points)), dtype=np.float64)
+    for start in range(0, n_flow, chunk_size):
+        p = {name: v[start:start + chunk_size, None, None, None] for name, v in params.items()}
+        kernel = GroundWaterInfiniteMatrixSolution(
+            p['mean_residence_time'],
+            p['peclet_number'],
+            p['dualPorosity_param'],
+            0,
+            fracture_retardation=p['frac_retard'],
+            matrix_retardation=p['matrix_retardation']
+        )(s)
+        if np.any(p['wsCoef'] > 0):
+            kernel = kernel * WellboreStorage(p['wsCoef'])(s)
+        if np.any(p['delay_time'] > 0):
+            kernel = kernel * PipelineDelay(p['delay_time'])(s)
+        recRatio = p['recRatio']
+        if paths is not None:
+            kernel = np.tensordot(kernel.reshape((-1, n_paths) + kernel.shape[1:]), path_weights, axes=([1], [0]))
+            recRatio = recRatio[::n_paths]
+        kernel = Recirculation(recRatio)(kernel)
+        values[start // n_paths:(start + chunk_size) // n_paths] = plan.invert(kernel * inputs)
+
+    recRatio = params['recRatio'][::n_paths]
+    if paths is not None:
+        dims.pop()
+        del coords[path_dim]
+    shape = [len(coords[dim]) for dim in dims]
+    coords['schedule'] = labels
+    coords['time'] = np.array(plan.time_points)
+    return ScenarioResult(
+        bckgrnd_conc + values.reshape(shape + [len(labels), len(plan.time_points)]),
+        dims + ['schedule', 'time'],
+        coords,
+        recRatio.reshape(shape + [1, 1]))
@@ -1,12 +1,33 @@
 import numpy as np
-import mpmath as mpm
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from .RELAP_v4 import *
+from .inversion_algorithms import invert_laplace, get_inversion_plan
+from .analytical_solutions import single_porosity_pulse_response, inverse_gaussian_cdf
+from .asymptotic_expansions import invert_with_asymptotics
+from .convolution_options import unit_pulse_response, sample_injection_history, convolve_injection_history
+from .Rose_data import time_points as rose_time_points
+from .cache_options import memoize_simulation
 
 
 
 
+def _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs):
+    tracer_injection = Input_Pulses_of_Tracer(
+        background_concentration=bckgrnd_conc,
+        injection_concentrations=inj_concs, # mg/L
+        injection_durations=inj_durs
+
+    )
+    if plan is None:
+        return tracer_injection
+    # the input function does not depend on flow parameters: evaluate it once per plan and schedule
+    key = ('pulses', float(bckgrnd_conc), tuple(np.ravel(inj_concs)), tuple(np.ravel(inj_durs)))
+    return plan.cached_node(tracer_injection, key)
+
+
 # single porosity
 
+@memoize_simulation
 def simulateSinglePorosity(
         mean_residence_time,
         peclet_number,
@@ -17,10 +38,18 @@ def simulateSinglePorosity(
         inj_durs,
         recRatio=0,
         wsCoef=0,
-        dps = 8
+        dps = 8,
+        engine = 'numpy',
+        plan = None,
+        closed_form = True,
+        return_error = False
 ):
     
-    mpm.mp.dps = dps
+    # without recirculation and wellbore storage the response is known in closed form
+    if closed_form and engine == 'numpy' and not return_error and recRatio == 0 and wsCoef == 0:
+        return bckgrnd_conc + single_porosity_pulse_response(
+            time_points, mean_residence_time, peclet_number, frac_retard, bckgrnd_conc, inj_concs, inj_durs)
+
     gw_inf = GroundWaterInfiniteMatrixSolution(
         mean_residence_time,
         peclet_number,
@@ -30,20 +59,93 @@ def simulateSinglePorosity(
         matrix_retardation=1
     )
 
-    tracer_injection = Input_Pulses_of_Tracer(
-        background_concentration=bckgrnd_conc,
-        injection_concentrations=inj_concs, # mg/L
-        injection_durations=inj_durs
+    if engine == 'numpy' and plan is None:
+        plan = get_inversion_plan(time_points)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
 
+    reciculation = Recirculation(recRatio)
+    if wsCoef > 0:
+        wellbore_storage = WellboreStorage(wsCoef)
+    else:
+        wellbore_storage = Identity()
+    relap_instance = RELAP_Modifed(
+        Ground_Water=gw_inf,
+        Input_Instance=tracer_injection,
+        recirculation=reciculation,
+        wellbore_storage_node=wellbore_storage
+    )
+
+    conc_values = Simulate_RELAP_Relative(
+        relap_instance,
+        time_points=time_points,
+        background_concentration=bckgrnd_conc,
+        engine=engine,
+        plan=plan,
+        dps=dps,
+        return_error=return_error
     )
 
+    # engine='adaptive' with return_error=True also returns the per-point error estimate
+    if return_error:
+        conc_values, error = conc_values
+        return np.array(conc_values, dtype=np.float64), error
+    return np.array(conc_values, dtype=np.float64)
+
+@memoize_simulation
+def simulateSinglePorosityMultiFracture(
+        mean_residence_times,
+        peclet_numbers,
+        fractional_recoveries,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        recRatio=0,
+        wsCoef=0,
+        dps = 8,
+        engine = 'numpy',
+        plan = None,
+        closed_form = True,
+        return_error = False
+):
+    """
+    N single-porosity flow paths (one entry per path in mean_residence_times, peclet_numbers
+    and fractional_recoveries) combined in the Laplace domain and inverted once. Recirculation
+    and wellbore storage act on the combined loop.
+    """
+
+    if closed_form and engine == 'numpy' and not return_error and recRatio == 0 and wsCoef == 0:
+        relative_concentration = 0
+        for mrt, pec, frec in zip(mean_residence_times, peclet_numbers, fractional_recoveries):
+            relative_concentration = relative_concentration + frec * single_porosity_pulse_response(
+                time_points, mrt, pec, frac_retard, bckgrnd_conc, inj_concs, inj_durs)
+        return bckgrnd_conc + relative_concentration
+
+    gw_paths = [
+        GroundWaterInfiniteMatrixSolution(
+            mrt,
+            pec,
+            0,
+            0,
+            fracture_retardation=frac_retard,
+            matrix_retardation=1
+        )
+        for mrt, pec in zip(mean_residence_times, peclet_numbers)
+    ]
+    gw_mixture = FractureMixture(gw_paths, fractional_recoveries)
+
+    if engine == 'numpy' and plan is None:
+        plan = get_inversion_plan(time_points)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
+
     reciculation = Recirculation(recRatio)
     if wsCoef > 0:
         wellbore_storage = WellboreStorage(wsCoef)
     else:
-        wellbore_storage = lambda x: 1
+        wellbore_storage = Identity()
     relap_instance = RELAP_Modifed(
-        Ground_Water=gw_inf,
+        Ground_Water=gw_mixture,
         Input_Instance=tracer_injection,
         recirculation=reciculation,
         wellbore_storage_node=wellbore_storage
@@ -52,11 +154,20 @@ def simulateSinglePorosity(
     conc_values = Simulate_RELAP_Relative(
         relap_instance,
         time_points=time_points,
-        background_concentration=bckgrnd_conc
+        background_concentration=bckgrnd_conc,
+        engine=engine,
+        plan=plan,
+        dps=dps,
+        return_error=return_error
     )
 
+    # engine='adaptive' with return_error=True also returns the per-point error estimate
+    if return_error:
+        conc_values, error = conc_values
+        return np.array(conc_values, dtype=np.float64), error
     return np.array(conc_values, dtype=np.float64)
 
+@memoize_simulation
 def simulateDualPorosity(
         mean_residence_time,
         peclet_number,
@@ -70,10 +181,22 @@ def simulateDualPorosity(
         matrix_retardation,
         wsCoef=0,
         delay_time=0,
-        dps = 8
+        dps = 8,
+        engine = 'numpy',
+        plan = None,
+        return_error = False,
+        asymptotic_tails = False,
+        tail_rtol = 1e-9
 ):
+    """
+    With the numpy engine and asymptotic_tails=True, early and late times are taken from the
+    large-s and small-s expansions of the network beyond computed crossover times; each
+    expansion is used only where it agrees with the numerical inversion to
+    tail_rtol * max|inj_concs - bckgrnd_conc|. This pays off on long, dense grids (thousands
+    of points spanning many residence times); on short grids the crossover search costs more
+    than it saves, so it is off by default.
+    """
     
-    mpm.mp.dps = dps
     gw_inf = GroundWaterInfiniteMatrixSolution(
         mean_residence_time,
         peclet_number,
@@ -83,19 +206,16 @@ def simulateDualPorosity(
         matrix_retardation=matrix_retardation
     )
 
-    tracer_injection = Input_Pulses_of_Tracer(
-        background_concentration=bckgrnd_conc,
-        injection_concentrations=inj_concs, # mg/L
-        injection_durations=inj_durs
-
-    )
+    if engine == 'numpy' and plan is None:
+        plan = get_inversion_plan(time_points)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
 
     reciculation = Recirculation(recRatio)
     pipelinedelay = PipelineDelay(delay_time=delay_time)
     if wsCoef > 0:
         wellbore_storage = WellboreStorage(wsCoef)
     else:
-        wellbore_storage = lambda x: 1
+        wellbore_storage = Identity()
 
     relap_instance = RELAP_Modifed(
         Ground_Water=gw_inf,
@@ -105,14 +225,383 @@ def simulateDualPorosity(
         wellbore_storage_node=wellbore_storage
     )
 
+    if asymptotic_tails and engine == 'numpy' and not return_error:
+        scale = np.max(np.abs(np.asarray(inj_concs, dtype=np.float64) - bckgrnd_conc))
+        series_key = ('dual_porosity',) + tuple(
+            tuple(np.ravel(np.asarray(value, dtype=np.float64))) for value in (
+                mean_residence_time, peclet_number, frac_retard, bckgrnd_conc, inj_concs, inj_durs,
+                recRatio, dualPorosity_param, matrix_retardation, wsCoef, delay_time))
+        relative_concentration, _ = invert_with_asymptotics(
+            relap_instance, time_points, atol=tail_rtol * scale, plan=plan, series_key=series_key)
+        return bckgrnd_conc + relative_concentration
+
     conc_values = Simulate_RELAP_Relative(
         relap_instance,
         time_points=time_points,
-        background_concentration=bckgrnd_conc
+        background_concentration=bckgrnd_conc,
+        engine=engine,
+        plan=plan,
+        dps=dps,
+        return_error=return_error
     )
 
+    # engine='adaptive' with return_error=True also returns the per-point error estimate
+    if return_error:
+        conc_values, error = conc_values
+        return np.array(conc_values, dtype=np.float64), error
     return np.array(conc_values, dtype=np.float64)
 
+# batched simulations - one row of concentrations per parameter set
+
+def _broadcast_parameters(*params):
+    params = np.broadcast_arrays(*[np.atleast_1d(np.asarray(p, dtype=np.float64)) for p in params])
+    if params[0].ndim != 1:
+        raise ValueError("Batched parameters must be scalars or 1-D arrays.")
+    return params
+
+def _simulate_batch(build_network, params, bckgrnd_conc, plan, chunk_size):
+    n_params = len(params[0])
+    conc_values = np.empty((n_params, len(plan.time_points)), dtype=np.float64)
+
+    # parameters go on a leading axis so every node broadcasts over (parameters, time points, abscissae)
+    for start in range(0, n_params, chunk_size):
+        chunk = [p[start:start + chunk_size, None, None] for p in params]
+        relap_instance = build_network(*chunk)
+        conc_values[start:start + chunk_size] = invert_laplace(relap_instance, plan.time_points, plan=plan)
+
+    return bckgrnd_conc + conc_values
+
+def _simulate_batch_closed_form(closed_form_rows, numerical_rows, params, recRatio, wsCoef, n_times):
+    # rows without recirculation and wellbore storage are evaluated in closed form, the rest numerically
+    n_params = len(params[0])
+    closed_form = (recRatio == 0) & (wsCoef == 0)
+    conc_values = np.empty((n_params, n_times), dtype=np.float64)
+    if closed_form.any():
+        conc_values[closed_form] = closed_form_rows([p[closed_form, None] for p in params])
+    if not closed_form.all():
+        conc_values[~closed_form] = numerical_rows([p[~closed_form] for p in params])
+    return conc_values
+
+@memoize_simulation
+def simulateSinglePorosityBatch(
+        mean_residence_time,
+        peclet_number,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        recRatio=0,
+        wsCoef=0,
+        method='dehoog',
+        order=None,
+        chunk_size=128,
+        plan=None,
+        closed_form=True
+):
+    """
+    Batched simulateSinglePorosity. Flow parameters are scalars or 1-D arrays broadcast
+    against each other; returns a (n_params, n_times) concentration matrix.
+    An InversionPlan for time_points may be passed as `plan` (method and order are then ignored).
+    Parameter sets without recirculation or wellbore storage use the closed-form solution
+    unless closed_form=False.
+    """
+
+    if plan is None:
+        plan = get_inversion_plan(time_points, method, order)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
+
+    def build_network(mrt, pec, frr, rec, ws):
+        gw_inf = GroundWaterInfiniteMatrixSolution(
+            mrt,
+            pec,
+            0,
+            0,
+            fracture_retardation=frr,
+            matrix_retardation=1
+        )
+        return RELAP_Modifed(
+            Ground_Water=gw_inf,
+            Input_Instance=tracer_injection,
+            recirculation=Recirculation(rec),
+            wellbore_storage_node=WellboreStorage(ws)
+        )
+
+    params = _broadcast_parameters(mean_residence_time, peclet_number, frac_retard, recRatio, wsCoef)
+    if not closed_form:
+        return _simulate_batch(build_network, params, bckgrnd_conc, plan, chunk_size)
+
+    def closed_form_rows(rows):
+        mrt, pec, frr = rows[:3]
+        return bckgrnd_conc + single_porosity_pulse_response(
+            plan.time_points, mrt, pec, frr, bckgrnd_conc, inj_concs, inj_durs)
+
+    return _simulate_batch_closed_form(
+        closed_form_rows,
+        lambda rows: _simulate_batch(build_network, rows, bckgrnd_conc, plan, chunk_size),
+        params, params[3], params[4], len(plan.time_points))
+
+@memoize_simulation
+def simulateSinglePorosityMultiFractureBatch(
+        mean_residence_times,
+        peclet_numbers,
+        fractional_recoveries,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        recRatio=0,
+        wsCoef=0,
+        method='dehoog',
+        order=None,
+        chunk_size=128,
+        plan=None,
+        closed_form=True
+):
+    """
+    Batched simulateSinglePorosityMultiFracture. mean_residence_times, peclet_numbers and
+    fractional_recoveries are (n_params, n_paths) arrays; frac_retard, recRatio and wsCoef are
+    scalars or 1-D arrays over parameter sets. Returns a (n_params, n_times) concentration matrix.
+    Parameter sets without recirculation or wellbore storage use the closed-form solution
+    unless closed_form=False.
+    """
+
+    mean_residence_times, peclet_numbers, fractional_recoveries = np.broadcast_arrays(
+        np.atleast_2d(mean_residence_times), np.atleast_2d(peclet_numbers), np.atleast_2d(fractional_recoveries))
+    n_paths = mean_residence_times.shape[1]
+
+    if plan is None:
+        plan = get_inversion_plan(time_points, method, order)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
+
+    def build_network(*chunk):
+        mrts, pecs, frecs = chunk[:n_paths], chunk[n_paths:2 * n_paths], chunk[2 * n_paths:3 * n_paths]
+        frr, rec, ws = chunk[3 * n_paths:]
+        gw_paths = [
+            GroundWaterInfiniteMatrixSolution(
+                mrt,
+                pec,
+                0,
+                0,
+                fracture_retardation=frr,
+                matrix_retardation=1
+            )
+            for mrt, pec in zip(mrts, pecs)
+        ]
+        return RELAP_Modifed(
+            Ground_Water=FractureMixture(gw_paths, frecs),
+            Input_Instance=tracer_injection,
+            recirculation=Recirculation(rec),
+            wellbore_storage_node=WellboreStorage(ws)
+        )
+
+    params = _broadcast_parameters(*mean_residence_times.T, *peclet_numbers.T, *fractional_recoveries.T,
+                                   frac_retard, recRatio, wsCoef)
+    if not closed_form:
+        return _simulate_batch(build_network, params, bckgrnd_conc, plan, chunk_size)
+
+    def closed_form_rows(rows):
+        mrts, pecs, frecs = rows[:n_paths], rows[n_paths:2 * n_paths], rows[2 * n_paths:3 * n_paths]
+        frr = rows[3 * n_paths]
+        relative_concentration = 0
+        for mrt, pec, frec in zip(mrts, pecs, frecs):
+            relative_concentration = relative_concentration + frec * single_porosity_pulse_response(
+                plan.time_points, mrt, pec, frr, bckgrnd_conc, inj_concs, inj_durs)
+        return bckgrnd_conc + relative_concentration
+
+    return _simulate_batch_closed_form(
+        closed_form_rows,
+        lambda rows: _simulate_batch(build_network, rows, bckgrnd_conc, plan, chunk_size),
+        params, params[-2], params[-1], len(plan.time_points))
+
+@memoize_simulation
+def simulateDualPorosityBatch(
+        mean_residence_time,
+        peclet_number,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        recRatio,
+        dualPorosity_param,
+        matrix_retardation,
+        wsCoef=0,
+        delay_time=0,
+        method='dehoog',
+        order=None,
+        chunk_size=128,
+        plan=None
+):
+    """
+    Batched simulateDualPorosity. Flow parameters are scalars or 1-D arrays broadcast
+    against each other; returns a (n_params, n_times) concentration matrix.
+    An InversionPlan for time_points may be passed as `plan` (method and order are then ignored).
+    """
+
+    if plan is None:
+        plan = get_inversion_plan(time_points, method, order)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
+
+    def build_network(mrt, pec, frr, rec, dP, mtr, ws, delay):
+        gw_inf = GroundWaterInfiniteMatrixSolution(
+            mrt,
+            pec,
+            dP,
+            0,
+            fracture_retardation=frr,
+            matrix_retardation=mtr
+        )
+        return RELAP_Modifed(
+            Ground_Water=gw_inf,
+            Input_Instance=tracer_injection,
+            recirculation=Recirculation(rec),
+            pipeline_delay_node=PipelineDelay(delay_time=delay),
+            wellbore_storage_node=WellboreStorage(ws)
+        )
+
+    params = _broadcast_parameters(mean_residence_time, peclet_number, frac_retard, recRatio,
+                                   dualPorosity_param, matrix_retardation, wsCoef, delay_time)
+    return _simulate_batch(build_network, params, bckgrnd_conc, plan, chunk_size)
+
+
+# arbitrary injection histories - pulse response inverted once, then convolved (FFT)
+
+def _convolve_history(pulse_response, time_points, bckgrnd_conc, injection_times, injection_concs, dt):
+    n_steps = pulse_response.shape[-1]
+    relative_history = sample_injection_history(injection_times, injection_concs, dt, n_steps) - bckgrnd_conc
+    conc_grid = convolve_injection_history(pulse_response, relative_history)
+    return bckgrnd_conc + np.interp(time_points, dt * np.arange(n_steps), conc_grid)
+
+@memoize_simulation
+def simulateSinglePorosityInjectionHistory(
+        mean_residence_time,
+        peclet_number,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        injection_times,
+        injection_concs,
+        dt,
+        recRatio=0,
+        wsCoef=0,
+        method='dehoog',
+        order=None,
+        closed_form=True
+):
+    """
+    simulateSinglePorosity for a sampled injection concentration history (injection_concs[i]
+    from injection_times[i] until the next sample) instead of a list of slugs. The history is
+    held on a uniform grid of step dt and convolved with the pulse response of the network,
+    then interpolated onto time_points.
+    """
+
+    n_steps = int(np.ceil(np.max(time_points) / dt)) + 1
+    if closed_form and recRatio == 0 and wsCoef == 0:
+        grid = dt * np.arange(n_steps)
+        pulse_response = (inverse_gaussian_cdf(grid, mean_residence_time, peclet_number, frac_retard)
+                          - inverse_gaussian_cdf(grid - dt, mean_residence_time, peclet_number, frac_retard))
+    else:
+        gw_inf = GroundWaterInfiniteMatrixSolution(
+            mean_residence_time,
+            peclet_number,
+            0,
+            0,
+            fracture_retardation=frac_retard,
+            matrix_retardation=1
+        )
+        if wsCoef > 0:
+            wellbore_storage = WellboreStorage(wsCoef)
+        else:
+            wellbore_storage = Identity()
+        loop_instance = RELAP_Modifed(
+            Ground_Water=gw_inf,
+            Input_Instance=Identity(),
+            recirculation=Recirculation(recRatio),
+            wellbore_storage_node=wellbore_storage
+        )
+        pulse_response = unit_pulse_response(loop_instance, dt, n_steps, method=method, order=order)
+
+    return _convolve_history(pulse_response, time_points, bckgrnd_conc, injection_times, injection_concs, dt)
+
+@memoize_simulation
+def simulateDualPorosityInjectionHistory(
+        mean_residence_time,
+        peclet_number,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        injection_times,
+        injection_concs,
+        dt,
+        recRatio,
+        dualPorosity_param,
+        matrix_retardation,
+        wsCoef=0,
+        delay_time=0,
+        method='dehoog',
+        order=None
+):
+    """
+    simulateDualPorosity for a sampled injection concentration history, see
+    simulateSinglePorosityInjectionHistory.
+    """
+
+    n_steps = int(np.ceil(np.max(time_points) / dt)) + 1
+    gw_inf = GroundWaterInfiniteMatrixSolution(
+        mean_residence_time,
+        peclet_number,
+        dualPorosity_param,
+        0,
+        fracture_retardation=frac_retard,
+        matrix_retardation=matrix_retardation
+    )
+    if wsCoef > 0:
+        wellbore_storage = WellboreStorage(wsCoef)
+    else:
+        wellbore_storage = Identity()
+    loop_instance = RELAP_Modifed(
+        Ground_Water=gw_inf,
+        Input_Instance=Identity(),
+        recirculation=Recirculation(recRatio),
+        pipeline_delay_node=PipelineDelay(delay_time=delay_time),
+        wellbore_storage_node=wellbore_storage
+    )
+    pulse_response = unit_pulse_response(loop_instance, dt, n_steps, method=method, order=order)
+
+    return _convolve_history(pulse_response, time_points, bckgrnd_conc, injection_times, injection_concs, dt)
+
+
+# many independent simulations - precision is per call, so threads are safe
+
+EXECUTION_BACKENDS = ('thread', 'process', 'serial')
+
+def simulateMany(simulate_function, parameter_sets, backend='thread', max_workers=None):
+    """
+    simulate_function : any simulate* function
+    parameter_sets    : iterable of keyword-argument dicts, one per simulation
+    backend           : 'thread' (in-process pool, no forking - Jupyter and services),
+                        'process' (process pool) or 'serial'
+
+    returns: list of results in the order of parameter_sets
+    """
+    parameter_sets = list(parameter_sets)
+    if backend == 'serial':
+        return [simulate_function(**kwargs) for kwargs in parameter_sets]
+    elif backend == 'thread':
+        executor = ThreadPoolExecutor
+    elif backend == 'process':
+        executor = ProcessPoolExecutor
+    else:
+        raise ValueError(f"Unknown execution backend '{backend}'. Choose one of {list(EXECUTION_BACKENDS)}.")
+
+    with executor(max_workers=max_workers) as exe:
+        futures = [exe.submit(simulate_function, **kwargs) for kwargs in parameter_sets]
+        return [fut.result() for fut in futures]
+
+
+@memoize_simulation
 def simulateDualPorosityInf(
         mean_residence_time,
         peclet_number,
@@ -124,41 +613,43 @@ def simulateDualPorosityInf(
         bckgrnd_conc,
         inj_concs,
         inj_durs,
-        dps = 8
+        dps = 8,
+        engine = 'numpy',
+        plan = None
 ):
     
-    mpm.mp.dps = dps
+    # infinite-matrix limit of GroundWaterFiniteMatrixSolution_2: dualPorosity_param = poro_ratio * matr_diff
     gw_inf = GroundWaterInfiniteMatrixSolution(
         mean_residence_time,
         peclet_number,
-        matr_diff,
-        poro_ratio,
+        poro_ratio * matr_diff,
         0,
         fracture_retardation=frac_retard,
         matrix_retardation=mtrx_retard
     )
 
-    tracer_injection = Input_Pulses_of_Tracer(
-        background_concentration=bckgrnd_conc,
-        injection_concentrations=inj_concs, # mg/L
-        injection_durations=inj_durs
-
-    )
+    if engine == 'numpy' and plan is None:
+        plan = get_inversion_plan(time_points)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
 
     relap_instance = RELAP_Modifed(
         Ground_Water=gw_inf,
-        Input_Isntance=tracer_injection
+        Input_Instance=tracer_injection
     )
 
     conc_values = Simulate_RELAP_Relative(
         relap_instance,
         time_points=time_points,
-        background_concentration=bckgrnd_conc
+        background_concentration=bckgrnd_conc,
+        engine=engine,
+        plan=plan,
+        dps=dps
     )
 
     return np.array(conc_values, dtype=np.float64)
 
 
+@memoize_simulation
 def simulateDualPorosityfinite(
         mean_residence_time,
         peclet_number,
@@ -171,10 +662,11 @@ def simulateDualPorosityfinite(
         bckgrnd_conc,
         inj_concs,
         inj_durs,
-        dps = 8
+        dps = 8,
+        engine = 'numpy',
+        plan = None
 ):
     
-    mpm.mp.dps = dps
     gw_inf = GroundWaterFiniteMatrixSolution_2(
         mean_residence_time,
         peclet_number,
@@ -186,53 +678,41 @@ def simulateDualPorosityfinite(
         matrix_retardation=mtrx_retard
     )
 
-    tracer_injection = Input_Pulses_of_Tracer(
-        background_concentration=bckgrnd_conc,
-        injection_concentrations=inj_concs, # mg/L
-        injection_durations=inj_durs
-
-    )
+    if engine == 'numpy' and plan is None:
+        plan = get_inversion_plan(time_points)
+    tracer_injection = _injection_node(plan, bckgrnd_conc, inj_concs, inj_durs)
 
     relap_instance = RELAP_Modifed(
         Ground_Water=gw_inf,
-        Input_Isntance=tracer_injection
+        Input_Instance=tracer_injection
     )
 
     conc_values = Simulate_RELAP_Relative(
         relap_instance,
         time_points=time_points,
-        background_concentration=bckgrnd_conc
+        background_concentration=bckgrnd_conc,
+        engine=engine,
+        plan=plan,
+        dps=dps
     )
 
     return np.array(conc_values, dtype=np.float64)
 
 
+@memoize_simulation
 def simulateRoseNDSSinglePoro(
         mean_residence_time,
         peclet_number,
-        dps=8
+        dps=8,
+        engine='numpy',
+        plan=None
 ):
     
     frac_retard = 1.0
     bckgrnd_conc = 0.0
     inj_concs = np.array([7.0, 0], dtype=float)
     inj_durs = np.cumsum(np.array([1.5]))
-    time_points = np.array(
-        [  0.000001    ,   1.12625698,   2.41340782,   3.5396648 ,
-           4.97640704,   5.91694907,   7.16864121,   8.41146867,
-           9.20175447,  10.63871832,  11.44606861,  13.39718362,
-          15.34807701,  17.46097234,  19.40144974,  21.50348585,
-          22.79484741,  23.92398541,  26.02247565,  27.95763424,
-          30.05302184,  31.98685073,  32.95354356,  35.20450621,
-          36.49564615,  40.52043031,  45.51257214,  47.28417748,
-          48.89422411,  50.98695231,  53.07746433,  55.00929867,
-          56.94113302,  59.1938686 ,  61.44638257,  65.4696154 ,
-          70.62043492,  73.03672376,  74.96745002,  77.21996399,
-          79.15069024,  81.0814165 ,  83.17303661,  85.42555058,
-          89.4485618 ,  96.52811302,  98.94152085, 101.03336257,
-         102.96475368, 106.98732167, 109.40095111, 113.58441295,
-         119.37570525, 121.30643151, 123.237601  , 125.0074334 ,
-         127.09883189, 128.87065885], dtype=float)
+    time_points = rose_time_points
 
     
     concs = simulateSinglePorosity(
@@ -243,18 +723,114 @@ def simulateRoseNDSSinglePoro(
         bckgrnd_conc,
         inj_concs,
         inj_durs,
-        dps = dps
+        dps = dps,
+        engine = engine,
+        plan = plan
 )
     
     return concs
 
 
+@memoize_simulation
+def simulateRoseNDSSinglePoroBatch(
+        mean_residence_time,
+        peclet_number,
+        chunk_size=128,
+        plan=None
+):
+
+    frac_retard = 1.0
+    bckgrnd_conc = 0.0
+    inj_concs = np.array([7.0, 0], dtype=float)
+    inj_durs = np.cumsum(np.array([1.5]))
+
+    concs = simulateSinglePorosityBatch(
+        mean_residence_time,
+        peclet_number,
+        frac_retard,
+        rose_time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        chunk_size=chunk_size,
+        plan=plan
+)
+
+    return concs
+
+
+@memoize_simulation
+def simulateRoseNDSSinglePoroMultiFracture(
+        mean_residence_times,
+        peclet_numbers,
+        fractional_recoveries,
+        dps=8,
+        engine='numpy',
+        plan=None
+):
+
+    frac_retard = 1.0
+    bckgrnd_conc = 0.0
+    inj_concs = np.array([7.0, 0], dtype=float)
+    inj_durs = np.cumsum(np.array([1.5]))
+    time_points = rose_time_points
+
+    concs = simulateSinglePorosityMultiFracture(
+        mean_residence_times,
+        peclet_numbers,
+        fractional_recoveries,
+        frac_retard,
+        time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        dps = dps,
+        engine = engine,
+        plan = plan
+)
+
+    return concs
+
+
+@memoize_simulation
+def simulateRoseNDSSinglePoroMultiFractureBatch(
+        mean_residence_times,
+        peclet_numbers,
+        fractional_recoveries,
+        chunk_size=128,
+        plan=None
+):
+
+    frac_retard = 1.0
+    bckgrnd_conc = 0.0
+    inj_concs = np.array([7.0, 0], dtype=float)
+    inj_durs = np.cumsum(np.array([1.5]))
+
+    concs = simulateSinglePorosityMultiFractureBatch(
+        mean_residence_times,
+        peclet_numbers,
+        fractional_recoveries,
+        frac_retard,
+        rose_time_points,
+        bckgrnd_conc,
+        inj_concs,
+        inj_durs,
+        chunk_size=chunk_size,
+        plan=plan
+)
+
+    return concs
+
+
+@memoize_simulation
 def simulateRoseNDSDualPoroInf(
         mean_residence_time,
         peclet_number,
         matr_diff,
         poro_ratio,
-        dps=8
+        dps=8,
+        engine='numpy',
+        plan=None
 ):
     
     frac_retard = 1.0
@@ -262,22 +838,7 @@ def simulateRoseNDSDualPoroInf(
     bckgrnd_conc = 0.0
     inj_concs = np.array([7.0, 0], dtype=float)
     inj_durs = np.cumsum(np.array([1.5]))
-    time_points = np.array(
-        [  0.000001    ,   1.12625698,   2.41340782,   3.5396648 ,
-           4.97640704,   5.91694907,   7.16864121,   8.41146867,
-           9.20175447,  10.63871832,  11.44606861,  13.39718362,
-          15.34807701,  17.46097234,  19.40144974,  21.50348585,
-          22.79484741,  23.92398541,  26.02247565,  27.95763424,
-          30.05302184,  31.98685073,  32.95354356,  35.20450621,
-          36.49564615,  40.52043031,  45.51257214,  47.28417748,
-          48.89422411,  50.98695231,  53.07746433,  55.00929867,
-          56.94113302,  59.1938686 ,  61.44638257,  65.4696154 ,
-          70.62043492,  73.03672376,  74.96745002,  77.21996399,
-          79.15069024,  81.0814165 ,  83.17303661,  85.42555058,
-          89.4485618 ,  96.52811302,  98.94152085, 101.03336257,
-         102.96475368, 106.98732167, 109.40095111, 113.58441295,
-         119.37570525, 121.30643151, 123.237601  , 125.0074334 ,
-         127.09883189, 128.87065885], dtype=float)
+    time_points = rose_time_points
 
     
     concs = simulateDualPorosityInf(
@@ -291,19 +852,23 @@ def simulateRoseNDSDualPoroInf(
         bckgrnd_conc,
         inj_concs,
         inj_durs,
-        dps=dps
-        
+        dps=dps,
+        engine=engine,
+        plan=plan
 )
     
     return concs
 
+@memoize_simulation
 def simulateRoseNDSDualPoroFinite(
         mean_residence_time,
         peclet_number,
         matr_diff,
         poro_ratio,
         wtr_ratio,
-        dps=8
+        dps=8,
+        engine='numpy',
+        plan=None
 ):
     
     frac_retard = 1.0
@@ -311,22 +876,7 @@ def simulateRoseNDSDualPoroFinite(
     bckgrnd_conc = 0.0
     inj_concs = np.array([7.0, 0], dtype=float)
     inj_durs = np.cumsum(np.array([1.5]))
-    time_points = np.array(
-        [  0.000001    ,   1.12625698,   2.41340782,   3.5396648 ,
-           4.97640704,   5.91694907,   7.16864121,   8.41146867,
-           9.20175447,  10.63871832,  11.44606861,  13.39718362,
-          15.34807701,  17.46097234,  19.40144974,  21.50348585,
-          22.79484741,  23.92398541,  26.02247565,  27.95763424,
-          30.05302184,  31.98685073,  32.95354356,  35.20450621,
-          36.49564615,  40.52043031,  45.51257214,  47.28417748,
-          48.89422411,  50.98695231,  53.07746433,  55.00929867,
-          56.94113302,  59.1938686 ,  61.44638257,  65.4696154 ,
-          70.62043492,  73.03672376,  74.96745002,  77.21996399,
-          79.15069024,  81.0814165 ,  83.17303661,  85.42555058,
-          89.4485618 ,  96.52811302,  98.94152085, 101.03336257,
-         102.96475368, 106.98732167, 109.40095111, 113.58441295,
-         119.37570525, 121.30643151, 123.237601  , 125.0074334 ,
-         127.09883189, 128.87065885], dtype=float)
+    time_points = rose_time_points
 
     
     concs = simulateDualPorosityfinite(
@@ -341,7 +891,9 @@ def simulateRoseNDSDualPoroFinite(
         bckgrnd_conc,
         inj_concs,
         inj_durs,
-        dps = dps
+        dps = dps,
+        engine = engine,
+        plan = plan
 )
     
     return concs
\ No newline at end of file
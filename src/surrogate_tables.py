@@ -0,0 +1,183 @@
+import os
+import numpy as np
+
+from .simulation_options import simulateSinglePorosityBatch
+from .Rose_data import time_points as rose_time_points
+
+
+# Precomputed single-porosity responses on a dense (MRT, Peclet) grid.
+#
+# The responses are stored as a plain .npy file so any number of worker processes can
+# np.load(..., mmap_mode='r') the same table and share it through the page cache. The
+# grid axes, time grid, injection schedule and validation errors go in a small .npz.
+
+RESPONSES_FILE = 'responses.npy'
+GRID_FILE = 'grid.npz'
+
+
+def _lagrange_weights(f):
+    # cubic Lagrange weights for stencil points at -1, 0, 1, 2
+    return np.stack([
+        -f * (f - 1) * (f - 2) / 6,
+        (f + 1) * (f - 1) * (f - 2) / 2,
+        -(f + 1) * f * (f - 2) / 2,
+        (f + 1) * f * (f - 1) / 6,
+    ])
+
+
+def build_single_porosity_table(
+        path,
+        mrt_range=(1, 50),
+        pe_range=(1, 100),
+        n_mrt=200,
+        n_pe=200,
+        time_points=rose_time_points,
+        frac_retard=1.0,
+        bckgrnd_conc=0.0,
+        inj_concs=np.array([7.0, 0], dtype=float),
+        inj_durs=np.cumsum(np.array([1.5])),
+        recRatio=0,
+        wsCoef=0,
+        n_validation=2000,
+        seed=None):
+    """
+    Tabulate simulateSinglePorosity relative concentrations (above background) on a grid
+    that is uniform in log(MRT) and log(Pe), write it to `path`, and record the interpolation
+    error against the exact model at `n_validation` random points of the box.
+
+    returns: SinglePorositySurrogate opened on the new table
+    """
+    if n_mrt < 4 or n_pe < 4:
+        raise ValueError("The surrogate grid needs at least 4 points per axis.")
+    os.makedirs(path, exist_ok=True)
+    time_points = np.asarray(time_points, dtype=np.float64)
+    log_mrt = np.linspace(np.log(mrt_range[0]), np.log(mrt_range[1]), n_mrt)
+    log_pe = np.linspace(np.log(pe_range[0]), np.log(pe_range[1]), n_pe)
+    pe_axis = np.exp(log_pe)
+
+    responses = np.lib.format.open_memmap(
+        os.path.join(path, RESPONSES_FILE), mode='w+', dtype=np.float64, shape=(n_mrt, n_pe, len(time_points)))
+    for i, mrt in enumerate(np.exp(log_mrt)):
+        responses[i] = simulateSinglePorosityBatch(
+            mrt, pe_axis, frac_retard, time_points, bckgrnd_conc, inj_concs, inj_durs,
+            recRatio=recRatio, wsCoef=wsCoef) - bckgrnd_conc
+    responses.flush()
+    del responses
+
+    np.savez(
+        os.path.join(path, GRID_FILE),
+        log_mrt=log_mrt,
+        log_pe=log_pe,
+        time_points=time_points,
+        frac_retard=frac_retard,
+        bckgrnd_conc=bckgrnd_conc,
+        inj_concs=np.asarray(inj_concs, dtype=np.float64),
+        inj_durs=np.asarray(inj_durs, dtype=np.float64),
+        recRatio=recRatio,
+        wsCoef=wsCoef,
+        max_abs_error=np.nan,
+        rms_error=np.nan,
+    )
+
+    surrogate = SinglePorositySurrogate(path)
+    if n_validation > 0:
+        max_abs_error, rms_error = surrogate.check_error(n_validation, seed=seed)
+        grid = dict(np.load(os.path.join(path, GRID_FILE)))
+        grid.update(max_abs_error=max_abs_error, rms_error=rms_error)
+        np.savez(os.path.join(path, GRID_FILE), **grid)
+        surrogate = SinglePorositySurrogate(path)
+    return surrogate
+
+
+class SinglePorositySurrogate:
+    """
+    Interpolating evaluator for a table written by build_single_porosity_table.
+
+    surrogate(mrt, pe)                   -> (n, n_times) concentrations
+    surrogate.mixture(mrts, pes, fracs)  -> (n, n_times) multi-fracture blend, (n, n_paths) inputs
+                                            (tables built with recRatio=0 only)
+    surrogate.max_abs_error              -> validation error recorded at build time
+    """
+    def __init__(self, path):
+        self.path = path
+        self.responses = np.load(os.path.join(path, RESPONSES_FILE), mmap_mode='r')
+        with np.load(os.path.join(path, GRID_FILE)) as grid:
+            self.log_mrt = grid['log_mrt']
+            self.log_pe = grid['log_pe']
+            self.time_points = grid['time_points']
+            self.frac_retard = float(grid['frac_retard'])
+            self.bckgrnd_conc = float(grid['bckgrnd_conc'])
+            self.inj_concs = grid['inj_concs']
+            self.inj_durs = grid['inj_durs']
+            self.recRatio = float(grid['recRatio'])
+            self.wsCoef = float(grid['wsCoef'])
+            self.max_abs_error = float(grid['max_abs_error'])
+            self.rms_error = float(grid['rms_error'])
+
+    @property
+    def mrt_range(self):
+        return float(np.exp(self.log_mrt[0])), float(np.exp(self.log_mrt[-1]))
+
+    @property
+    def pe_range(self):
+        return float(np.exp(self.log_pe[0])), float(np.exp(self.log_pe[-1]))
+
+    def _stencil(self, log_values, axis):
+        n = len(axis)
+        h = axis[1] - axis[0]
+        u = (log_values - axis[0]) / h
+        i = np.clip(np.floor(u).astype(int), 1, n - 3)
+        return i - 1, _lagrange_weights(u - i)
+
+    def relative(self, mean_residence_time, peclet_number):
+        """
+        Interpolated concentrations above background, bicubic in (log MRT, log Pe).
+        """
+        mean_residence_time, peclet_number = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(mean_residence_time, dtype=np.float64)),
+            np.atleast_1d(np.asarray(peclet_number, dtype=np.float64)))
+        log_m = np.log(mean_residence_time)
+        log_p = np.log(peclet_number)
+        tol = 1e-12
+        if (np.any(log_m < self.log_mrt[0] - tol) or np.any(log_m > self.log_mrt[-1] + tol)
+                or np.any(log_p < self.log_pe[0] - tol) or np.any(log_p > self.log_pe[-1] + tol)):
+            raise ValueError(f"Query outside the tabulated box MRT {self.mrt_range}, Pe {self.pe_range}.")
+
+        i0, wm = self._stencil(log_m, self.log_mrt)
+        j0, wp = self._stencil(log_p, self.log_pe)
+        values = np.zeros(log_m.shape + (len(self.time_points),))
+        for a in range(4):
+            for b in range(4):
+                values += (wm[a] * wp[b])[..., None] * self.responses[i0 + a, j0 + b]
+        return values
+
+    def __call__(self, mean_residence_time, peclet_number):
+        return self.bckgrnd_conc + self.relative(mean_residence_time, peclet_number)
+
+    def mixture(self, mean_residence_times, peclet_numbers, fractional_recoveries):
+        if self.recRatio != 0:
+            # F = L / (1 - r*L) is not linear in the per-path responses, so blending them is wrong
+            raise ValueError("mixture needs a table built with recRatio=0; recirculation acts on the blended paths.")
+        mean_residence_times, peclet_numbers, fractional_recoveries = np.broadcast_arrays(
+            np.atleast_2d(mean_residence_times), np.atleast_2d(peclet_numbers), np.atleast_2d(fractional_recoveries))
+        values = 0
+        for k in range(mean_residence_times.shape[1]):
+            values = values + fractional_recoveries[:, k, None] * self.relative(
+                mean_residence_times[:, k], peclet_numbers[:, k])
+        return self.bckgrnd_conc + values
+
+    def exact(self, mean_residence_time, peclet_number):
+        return simulateSinglePorosityBatch(
+            mean_residence_time, peclet_number, self.frac_retard, self.time_points,
+            self.bckgrnd_conc, self.inj_concs, self.inj_durs, recRatio=self.recRatio, wsCoef=self.wsCoef)
+
+    def check_error(self, n_samples=2000, seed=None):
+        """
+        Max and RMS absolute interpolation error against the exact model at random
+        (log-uniform) points of the tabulated box.
+        """
+        rng = np.random.default_rng(seed)
+        mrt = np.exp(rng.uniform(self.log_mrt[0], self.log_mrt[-1], n_samples))
+        pe = np.exp(rng.uniform(self.log_pe[0], self.log_pe[-1], n_samples))
+        error = self(mrt, pe) - self.exact(mrt, pe)
+        return float(np.max(np.abs(error))), float(np.sqrt(np.mean(error ** 2)))
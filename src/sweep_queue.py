@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Multi-host sweeps through a work queue on a shared filesystem.
+
+    python -m src.sweep_queue init configs/single_porosity_two_fracture.json QUEUE_DIR
+    python -m src.sweep_queue worker QUEUE_DIR [--lease 600] [--max-chunks N]    (on each host, any number)
+    python -m src.sweep_queue status QUEUE_DIR
+    python -m src.sweep_queue merge QUEUE_DIR [--output DIR] [--csv results.csv]
+
+The queue directory holds the sweep config (queue.json), one lease file per chunk being
+run (leases/) and one result shard per finished chunk (shards/). Workers need no
+coordinator: a chunk is claimed by hard-linking a lease file into place, which succeeds
+for exactly one worker (also on NFS), and is finished by renaming its shard into place.
+A worker renews its lease while it runs; a lease not renewed within its lifetime (the
+worker died or its host went down) is taken over by the next worker that looks. Chunks
+are deterministic, so a chunk run twice after a takeover writes the same shard.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+import numpy as np
+
+from .sweep_runner import SweepStore, prepare_config, n_chunks, chunk_sampler, _run_chunk, _sweep_definition
+
+
+QUEUE_FILE = 'queue.json'
+LEASE_DIR = 'leases'
+SHARD_DIR = 'shards'
+LEASE_SUFFIX = '.lease'
+SHARD_SUFFIX = '.npz'
+DEFAULT_LEASE_SECONDS = 600
+CURVES_KEY = '_curves'    # shard entry holding the chunk's curves when the sweep stores them
+
+
+def _chunk_name(chunk_id):
+    return f'chunk_{chunk_id:08d}'
+
+
+def _lease_path(path, chunk_id):
+    return os.path.join(path, LEASE_DIR, _chunk_name(chunk_id) + LEASE_SUFFIX)
+
+
+def _shard_path(path, chunk_id):
+    return os.path.join(path, SHARD_DIR, _chunk_name(chunk_id) + SHARD_SUFFIX)
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+def init_queue(config, path):
+    """
+    Create the queue for `config` in the directory `path` (or reopen it for the same sweep).
+
+    returns: the stored config, with the seed fixed
+    """
+    queue_path = os.path.join(path, QUEUE_FILE)
+    if not os.path.exists(queue_path):
+        os.makedirs(os.path.join(path, LEASE_DIR), exist_ok=True)
+        os.makedirs(os.path.join(path, SHARD_DIR), exist_ok=True)
+        tmp_path = _write_json(queue_path, prepare_config(config))
+        try:
+            # link, not replace: when two hosts initialize at once, the first config wins
+            os.link(tmp_path, queue_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    stored = load_queue(path)
+    if config.get('seed') is None:
+        config = dict(config, seed=stored['seed'])
+    if _sweep_definition(prepare_config(config)) != _sweep_definition(stored):
+        raise ValueError(f"{path} holds a different sweep; use another queue directory.")
+    return stored
+
+
+def load_queue(path):
+    with open(os.path.join(path, QUEUE_FILE)) as f:
+        return json.load(f)
+
+
+def _read_lease(lease_path):
+    try:
+        with open(lease_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        # gone, or caught between create and write: treat as held
+        return None
+
+
+class _Lease:
+    """
+    Hold the lease on one chunk, renewing it from a background thread until released.
+    """
+    def __init__(self, lease_path, worker, lease_seconds):
+        self.lease_path = lease_path
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _content(self):
+        return {'worker': self.worker, 'token': self.token, 'expires': time.time() + self.lease_seconds}
+
+    def acquire(self):
+        tmp_path = _write_json(self.lease_path, self._content())
+        try:
+            os.link(tmp_path, self.lease_path)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        self._thread = threading.Thread(target=self._renew, daemon=True)
+        self._thread.start()
+        return True
+
+    def _renew(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            lease = _read_lease(self.lease_path)
+            if lease is None or lease.get('token') != self.token:
+                # taken over after we stalled; finishing the chunk anyway is harmless
+                return
+            os.replace(_write_json(self.lease_path, self._content()), self.lease_path)
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        lease = _read_lease(self.lease_path)
+        if lease is not None and lease.get('token') == self.token:
+            _remove(self.lease_path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _break_expired(lease_path):
+    # move an expired lease aside; rename is atomic, so one worker wins the takeover
+    lease = _read_lease(lease_path)
+    if lease is None or lease['expires'] > time.time():
+        return False
+    stale_path = f'{lease_path}.{uuid.uuid4().hex}.stale'
+    try:
+        os.rename(lease_path, stale_path)
+    except FileNotFoundError:
+        return False
+    _remove(stale_path)
+    return True
+
+
+def claim_chunk(path, worker, lease_seconds=DEFAULT_LEASE_SECONDS, chunk_ids=None):
+    """
+    Claim the first chunk without a shard and without a live lease.
+
+    returns: (chunk_id, lease), or (None, None) when nothing is claimable right now
+    """
+    config = load_queue(path)
+    for chunk_id in (range(n_chunks(config)) if chunk_ids is None else chunk_ids):
+        if os.path.exists(_shard_path(path, chunk_id)):
+            continue
+        lease_path = _lease_path(path, chunk_id)
+        if os.path.exists(lease_path) and not _break_expired(lease_path):
+            continue
+        lease = _Lease(lease_path, worker, lease_seconds)
+        if not lease.acquire():
+            continue
+        if os.path.exists(_shard_path(path, chunk_id)):
+            # finished by the previous holder between our checks
+            lease.release()
+            continue
+        return chunk_id, lease
+    return None, None
+
+
+def _write_shard(path, chunk_id, columns):
+    shard_path = _shard_path(path, chunk_id)
+    tmp_path = f'{shard_path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **{name: np.asarray(values, dtype=np.float32 if name == CURVES_KEY else np.float64)
+                       for name, values in columns.items()})
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, shard_path)
+
+
+def run_worker(path, worker=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_chunks=None, poll_seconds=5.0):
+    """
+    Claim, simulate and store chunks until every chunk has a shard (or `max_chunks` are done).
+    While only chunks leased by other workers remain, poll for leases that expire.
+
+    returns: number of chunks this worker completed
+    """
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    config = load_queue(path)
+    chunk_columns = chunk_sampler(config)
+    done = 0
+    while max_chunks is None or done < max_chunks:
+        chunk_id, lease = claim_chunk(path, worker, lease_seconds)
+        if chunk_id is None:
+            if not pending_chunks(path):
+                break
+            time.sleep(poll_seconds)
+            continue
+        try:
+            _, columns, mse, r2_value, curves = _run_chunk(
+                config['model'], chunk_id, chunk_columns(chunk_id), bool(config.get('store_curves')))
+            columns = dict(columns, MSE=mse, R2=r2_value)
+            if curves is not None:
+                columns[CURVES_KEY] = curves
+            _write_shard(path, chunk_id, columns)
+        finally:
+            lease.release()
+        done += 1
+    return done
+
+
+def pending_chunks(path):
+    config = load_queue(path)
+    return [chunk_id for chunk_id in range(n_chunks(config)) if not os.path.exists(_shard_path(path, chunk_id))]
+
+
+def queue_status(path):
+    """
+    returns: {"chunks", "done", "leased", "expired", "pending"} chunk counts
+    """
+    config = load_queue(path)
+    status = {'chunks': n_chunks(config), 'done': 0, 'leased': 0, 'expired': 0, 'pending': 0}
+    now = time.time()
+    for chunk_id in range(status['chunks']):
+        if os.path.exists(_shard_path(path, chunk_id)):
+            status['done'] += 1
+            continue
+        lease = _read_lease(_lease_path(path, chunk_id))
+        if lease is None:
+            status['pending'] += 1
+        elif lease['expires'] > now:
+            status['leased'] += 1
+        else:
+            status['expired'] += 1
+    return status
+
+
+def merge_queue(path, output, allow_partial=False):
+    """
+    Collect the shards into a SweepStore in `output` (read with SweepStore(output).read() or
+    the sweep runner); chunks already in the store are skipped, so merging is repeatable.
+
+    returns: DataFrame of all merged iterations
+    """
+    config = load_queue(path)
+    missing = pending_chunks(path)
+    if missing and not allow_partial:
+        raise RuntimeError(f"{len(missing)} of {n_chunks(config)} chunks have no shard yet (first: {missing[0]}).")
+    store = SweepStore(output, config)
+    completed = store.completed_chunks
+    for chunk_id in range(n_chunks(config)):
+        if chunk_id in completed or chunk_id in missing:
+            continue
+        with np.load(_shard_path(path, chunk_id)) as shard:
+            curves = shard[CURVES_KEY] if CURVES_KEY in shard else None
+            store.append(chunk_id, {name: shard[name] for name in store.columns}, curves)
+    return store.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    init = commands.add_parser('init', help='create a queue from a sweep config')
+    init.add_argument('config', help='JSON sweep configuration')
+    init.add_argument('queue', help='queue directory on the shared filesystem')
+    worker = commands.add_parser('worker', help='run chunks until the queue is drained')
+    worker.add_argument('queue')
+    worker.add_argument('--lease', type=float, default=DEFAULT_LEASE_SECONDS, help='lease lifetime in seconds')
+    worker.add_argument('--max-chunks', type=int, default=None, help='stop after this many chunks')
+    worker.add_argument('--poll', type=float, default=5.0, help='seconds between checks for expired leases')
+    status = commands.add_parser('status', help='print chunk counts')
+    status.add_argument('queue')
+    merge = commands.add_parser('merge', help='collect the shards into a results store')
+    merge.add_argument('queue')
+    merge.add_argument('--output', help='result directory (default: config "output" entry)')
+    merge.add_argument('--csv', help='also write the merged results to this CSV file')
+    merge.add_argument('--allow-partial', action='store_true', help='merge although chunks are missing')
+    args = parser.parse_args()
+
+    if args.command == 'init':
+        with open(args.config) as f:
+            config = json.load(f)
+        config = init_queue(config, args.queue)
+        print(f"{n_chunks(config)} chunks queued in {args.queue}")
+    elif args.command == 'worker':
+        done = run_worker(args.queue, lease_seconds=args.lease, max_chunks=args.max_chunks, poll_seconds=args.poll)
+        print(f"{done} chunks completed")
+    elif args.command == 'status':
+        print(json.dumps(queue_status(args.queue), indent=2))
+    else:
+        output = args.output or load_queue(args.queue).get('output')
+        if output is None:
+            parser.error('no output directory given')
+        df = merge_queue(args.queue, output, allow_partial=args.allow_partial)
+        if args.csv:
+            df.to_csv(args.csv, index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Resumable, chunked LHS sweep runner.
+
+    python -m src.sweep_runner configs/single_porosity_two_fracture.json [--output DIR] [--workers N] [--backend thread] [--instrument stats.json]
+
+The config names a model from SWEEP_MODELS and gives parameter ranges, sample count,
+seed and chunk size, and optionally a "sampler" from SAMPLING_METHODS and the
+"log_scale" parameters sampled log-uniformly (without a sampler, lhs_sample is used).
+Chunks of samples go to a process pool sized to the available
+cores (or a thread pool with --backend thread); each finished chunk is appended to an append-only columnar store (one raw
+float64 file per column plus manifest.json). Rerunning the same command resumes by
+skipping the chunks recorded in the manifest. With "store_curves": true (or --store-curves)
+every simulated curve is also kept, in a float32 memory-mapped (n_samples, n_times) array,
+so metrics against new data can be recomputed without rerunning the sweep (SweepStore.score,
+SweepStore.top_k).
+"""
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tqdm import tqdm
+
+from .simulation_options import simulateRoseNDSSinglePoroBatch, simulateRoseNDSSinglePoroMultiFractureBatch
+from .sampling_algorithms import lhs_sample, sample as design_sample, sample_rows, SAMPLING_METHODS
+from .metrics_options import least_squares_error, calcR2
+from .Rose_data import nds_true_conc, time_points as rose_time_points
+from .instrumentation_options import instrumented, submit_timed, record_task
+
+
+MANIFEST_FILE = 'manifest.json'
+COLUMN_SUFFIX = '.f8'
+CURVES_FILE = 'curves.f4'
+CURVE_TIMES_FILE = 'curve_times.f8'
+SCORE_BLOCK_ROWS = 65536
+
+
+# --- models: columns of sampled parameters -> (n, n_times) predictions on the Rose grid ---
+
+def _single_porosity(columns):
+    return simulateRoseNDSSinglePoroBatch(columns['mean_residence_time'], columns['peclet_number'])
+
+def _single_porosity_multi_fracture(columns):
+    n_paths = sum(1 for name in columns if name.startswith('mean_residence_time_'))
+    mrts = np.column_stack([columns[f'mean_residence_time_{j + 1}'] for j in range(n_paths)])
+    pecs = np.column_stack([columns[f'peclet_number_{j + 1}'] for j in range(n_paths)])
+    if n_paths == 2 and 'fractional_recovery' in columns:
+        # two-fracture sweep convention: the second path takes 1 - fractional_recovery
+        frecs = np.column_stack([columns['fractional_recovery'], 1 - columns['fractional_recovery']])
+    else:
+        frecs = np.column_stack([columns[f'fractional_recovery_{j + 1}'] for j in range(n_paths)])
+    return simulateRoseNDSSinglePoroMultiFractureBatch(mrts, pecs, frecs)
+
+SWEEP_MODELS = {
+    'single_porosity': _single_porosity,
+    'single_porosity_multi_fracture': _single_porosity_multi_fracture,
+}
+# every sweep model predicts on the Rose sample times
+SWEEP_TIME_POINTS = rose_time_points
+
+
+def available_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# --- append-only columnar store ---
+
+class SweepStore:
+    """
+    One raw float64 file per column, appended chunk by chunk. manifest.json records the
+    config, the committed row count and the completed chunk ids; bytes past the committed
+    row count (a chunk interrupted mid-write) are truncated when the store is reopened.
+
+    With store_curves, curves.f4 is a preallocated float32 (n_samples, n_times) array whose
+    row i is the curve of iteration i (curve_times.f8 holds the times); a chunk's rows are
+    written and flushed before the chunk is committed to the manifest.
+    """
+    def __init__(self, path, config=None):
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+            if config is not None and _sweep_definition(config) != _sweep_definition(self.manifest['config']):
+                raise ValueError(f"{path} holds a different sweep; use another output directory.")
+        else:
+            if config is None:
+                raise FileNotFoundError(f"No sweep manifest in {path}.")
+            os.makedirs(path, exist_ok=True)
+            columns = ['iteration'] + list(config['parameters']) + ['MSE', 'R2']
+            self.manifest = {'config': config, 'columns': columns, 'n_rows': 0, 'completed_chunks': []}
+            if config.get('store_curves'):
+                self._allocate_curves(config['n_samples'], SWEEP_TIME_POINTS)
+            self._write_manifest()
+
+        for name in self.columns:
+            column_path = self._column_path(name)
+            with open(column_path, 'ab') as f:
+                pass
+            os.truncate(column_path, self.manifest['n_rows'] * 8)
+
+    @property
+    def columns(self):
+        return self.manifest['columns']
+
+    @property
+    def completed_chunks(self):
+        return set(self.manifest['completed_chunks'])
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + COLUMN_SUFFIX)
+
+    def _write_manifest(self):
+        tmp_path = os.path.join(self.path, MANIFEST_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_FILE))
+
+    def _allocate_curves(self, n_samples, time_points):
+        time_points = np.asarray(time_points, dtype=np.float64)
+        time_points.tofile(os.path.join(self.path, CURVE_TIMES_FILE))
+        # sparse on most filesystems: rows take space as chunks are written
+        with open(os.path.join(self.path, CURVES_FILE), 'wb') as f:
+            f.truncate(n_samples * len(time_points) * 4)
+        self.manifest['curves'] = {'dtype': 'float32', 'shape': [n_samples, len(time_points)]}
+
+    @property
+    def curve_times(self):
+        if 'curves' not in self.manifest:
+            return None
+        return np.fromfile(os.path.join(self.path, CURVE_TIMES_FILE), dtype=np.float64)
+
+    def curves(self, mode='r'):
+        """
+        Memory-mapped (n_samples, n_times) float32 curves, row = iteration (rows of chunks not
+        yet completed are zero); None when the sweep does not store curves.
+        """
+        if 'curves' not in self.manifest:
+            return None
+        return np.memmap(os.path.join(self.path, CURVES_FILE), dtype=np.float32, mode=mode,
+                         shape=tuple(self.manifest['curves']['shape']))
+
+    def append(self, chunk_id, columns, curves=None):
+        if 'curves' in self.manifest:
+            if curves is None:
+                raise ValueError("This sweep stores curves; append needs the chunk's curves.")
+            stored = self.curves(mode='r+')
+            stored[np.asarray(columns['iteration'], dtype=np.int64)] = curves
+            stored.flush()
+            del stored
+        n = None
+        for name in self.columns:
+            values = np.ascontiguousarray(columns[name], dtype=np.float64)
+            n = len(values)
+            with open(self._column_path(name), 'ab') as f:
+                f.write(values.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self.manifest['n_rows'] += n
+        self.manifest['completed_chunks'].append(int(chunk_id))
+        self._write_manifest()
+
+    def read(self, sort=True):
+        n_rows = self.manifest['n_rows']
+        data = {name: np.fromfile(self._column_path(name), dtype=np.float64, count=n_rows) for name in self.columns}
+        df = pd.DataFrame(data)
+        df['iteration'] = df['iteration'].astype(int)
+        if sort:
+            df = df.sort_values('iteration').reset_index(drop=True)
+        return df
+
+    def score(self, observed, observed_times=None, metrics=None, block_rows=SCORE_BLOCK_ROWS):
+        """
+        Metrics of every completed curve against new data, block by block from the memory map.
+
+        observed      : values at curve_times, or at `observed_times` (e.g. a window of the
+                        stored times or another dataset's times; curves are linearly
+                        interpolated there and held constant past the stored range)
+        metrics       : {"name": f(prediction, observed) -> one value per row}; default MSE and R2
+        returns: read() with one column per metric (replacing the stored MSE / R2 by default)
+        """
+        curves = self.curves()
+        if curves is None:
+            raise ValueError(f"{self.path} does not store curves; run the sweep with store_curves.")
+        df = self.read()
+        rows = df['iteration'].to_numpy()
+        observed = np.asarray(observed, dtype=np.float64)
+        if observed_times is not None:
+            times = self.curve_times
+            observed_times = np.asarray(observed_times, dtype=np.float64)
+            index = np.clip(np.searchsorted(times, observed_times, side='right') - 1, 0, len(times) - 2)
+            weight = np.clip((observed_times - times[index]) / (times[index + 1] - times[index]), 0, 1)
+        metrics = SCORE_METRICS if metrics is None else metrics
+
+        values = {name: np.empty(len(rows)) for name in metrics}
+        for start in range(0, len(rows), block_rows):
+            block = slice(start, start + block_rows)
+            # rows are sorted by iteration, so each block is one forward pass over the file
+            prediction = np.asarray(curves[rows[block]], dtype=np.float64)
+            if observed_times is not None:
+                prediction = prediction[:, index] * (1 - weight) + prediction[:, index + 1] * weight
+            for name, metric in metrics.items():
+                values[name][block] = metric(prediction, observed)
+        for name, value in values.items():
+            df[name] = value
+        return df
+
+    def top_k(self, k, by='MSE', largest=False, **score_args):
+        """
+        The k best iterations by the column `by` (largest=True for e.g. R2). With score_args
+        (observed=..., see score) they are ranked against new data instead of the stored metrics.
+        Their curves are self.curves()[top['iteration']].
+        """
+        df = self.score(**score_args) if score_args else self.read()
+        return df.nlargest(k, by) if largest else df.nsmallest(k, by)
+
+
+def _sweep_definition(config):
+    # the parts of a config that fix which samples are drawn, how they are scored and what is stored
+    keys = ('model', 'parameters', 'n_samples', 'seed', 'chunk_size', 'sampler', 'log_scale')
+    definition = {key: config.get(key) for key in keys}
+    definition['store_curves'] = bool(config.get('store_curves'))
+    return definition
+
+
+# --- worker ---
+
+def _mse(prediction, observed):
+    return least_squares_error(prediction, observed, mean=True)
+
+SCORE_METRICS = {'MSE': _mse, 'R2': calcR2}
+
+
+def _run_chunk(model, chunk_id, columns, keep_curves=False):
+    prediction = SWEEP_MODELS[model](columns)
+    mse = _mse(prediction, nds_true_conc)
+    r2_value = calcR2(prediction, nds_true_conc)
+    curves = prediction.astype(np.float32) if keep_curves else None
+    return chunk_id, columns, mse, r2_value, curves
+
+
+def prepare_config(config):
+    """
+    Validated copy of a sweep config with the default chunk size and a fixed seed.
+    """
+    if config['model'] not in SWEEP_MODELS:
+        raise ValueError(f"Unknown model '{config['model']}'. Choose one of {list(SWEEP_MODELS)}.")
+    if config.get('sampler') not in (None,) + SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampler '{config['sampler']}'. Choose one of {list(SAMPLING_METHODS)}.")
+    config = dict(config)
+    config.setdefault('chunk_size', 256)
+    if config.get('seed') is None:
+        # a fixed seed is what lets a resumed run draw the same samples
+        config['seed'] = int(np.random.SeedSequence().entropy % (2 ** 32))
+    return config
+
+
+def n_chunks(config):
+    return -(-config['n_samples'] // config['chunk_size'])
+
+
+def chunk_sampler(config):
+    """
+    chunk_columns(chunk_id) -> {"iteration": array, "param_name": array, ...} for the rows of
+    that chunk; the same config gives the same rows in any process.
+    """
+    n, chunk_size = config['n_samples'], config['chunk_size']
+    sampler, log_scale = config.get('sampler'), tuple(config.get('log_scale') or ())
+    if sampler is None:
+        sample = lhs_sample(config['parameters'], n, seed=config['seed'])
+        sample = {name: np.asarray(values) for name, values in sample.items()}
+    elif sampler == 'maximin_lhs':
+        sample = design_sample(config['parameters'], n, sampler, seed=config['seed'], log_scale=log_scale)
+    else:
+        # rows are generated per chunk, so the design is never held in memory
+        sample = None
+
+    def chunk_columns(chunk_id):
+        start, stop = chunk_id * chunk_size, min((chunk_id + 1) * chunk_size, n)
+        if sample is None:
+            return sample_rows(config['parameters'], n, start, stop, sampler, config['seed'], log_scale)
+        return {name: values[start:stop] for name, values in sample.items()}
+
+    return chunk_columns
+
+
+def run_sweep(config, output, max_workers=None, backend='process', instrument=None):
+    """
+    Run (or resume) the sweep described by `config` into the directory `output`.
+
+    config: {"model": name in SWEEP_MODELS, "parameters": {"name": [min, max], ...},
+             "n_samples": int, "seed": int, "chunk_size": int,
+             optional "sampler": name in SAMPLING_METHODS, "log_scale": [name, ...],
+             "store_curves": bool}
+             without "seed", a random seed is fixed on the first run into `output` and
+             reused when the sweep is resumed
+    backend: 'process' or 'thread'
+    instrument: path for instrumentation stats (node timings, evaluations per time point,
+                worker queue / execution time); None runs uninstrumented
+
+    returns: DataFrame of all completed iterations
+    """
+    if backend not in ('process', 'thread'):
+        raise ValueError(f"Unknown backend '{backend}'. Choose 'process' or 'thread'.")
+    manifest_path = os.path.join(output, MANIFEST_FILE)
+    if config.get('seed') is None and os.path.exists(manifest_path):
+        # resuming a seedless sweep: keep the seed drawn on its first run
+        with open(manifest_path) as f:
+            config = dict(config, seed=json.load(f)['config']['seed'])
+    store = SweepStore(output, prepare_config(config))
+    config = store.manifest['config']
+    completed = store.completed_chunks
+    todo = [chunk_id for chunk_id in range(n_chunks(config)) if chunk_id not in completed]
+    max_workers = max_workers or available_workers()
+    chunk_columns = chunk_sampler(config)
+
+    if instrument is not None:
+        with instrumented(instrument):
+            _run_chunks(config, store, todo, chunk_columns, max_workers, backend, instrument=True)
+    else:
+        _run_chunks(config, store, todo, chunk_columns, max_workers, backend)
+
+    return store.read()
+
+
+def _run_chunks(config, store, todo, chunk_columns, max_workers, backend, instrument=False):
+    n = config['n_samples']
+    executor = ProcessPoolExecutor if backend == 'process' else ThreadPoolExecutor
+    keep_curves = bool(config.get('store_curves'))
+    with executor(max_workers=max_workers) as exe, \
+            tqdm(total=n, initial=store.manifest['n_rows'], desc='Simulating iterations ..', unit='iter') as pbar:
+
+        def submit(chunk_id):
+            if instrument:
+                return submit_timed(exe, _run_chunk, config['model'], chunk_id, chunk_columns(chunk_id), keep_curves)
+            return exe.submit(_run_chunk, config['model'], chunk_id, chunk_columns(chunk_id), keep_curves)
+
+        queue = iter(todo)
+        pending = set()
+        # keep a bounded number of chunks in flight instead of submitting everything up front
+        for chunk_id in queue:
+            pending.add(submit(chunk_id))
+            if len(pending) >= 2 * max_workers:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                result = fut.result()
+                if instrument:
+                    result, report = result
+                    record_task(report)
+                chunk_id, columns, mse, r2_value, curves = result
+                columns = dict(columns, MSE=mse, R2=r2_value)
+                store.append(chunk_id, columns, curves)
+                pbar.update(len(mse))
+                next_chunk = next(queue, None)
+                if next_chunk is not None:
+                    pending.add(submit(next_chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('config', help='JSON sweep configuration (without "seed", the seed drawn on the first run is kept for resumes)')
+    parser.add_argument('--output', help='result directory (default: config "output" entry)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: available cores)')
+    parser.add_argument('--backend', choices=['process', 'thread'], default='process', help='worker pool type')
+    parser.add_argument('--csv', help='also write the completed results to this CSV file')
+    parser.add_argument('--instrument', help='write instrumentation stats (JSON) to this file')
+    parser.add_argument('--store-curves', action='store_true', help='keep every simulated curve (float32 memory map)')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    output = args.output or config.get('output')
+    if output is None:
+        parser.error('no output directory given')
+    if args.store_curves:
+        config['store_curves'] = True
+
+    df = run_sweep(config, output, max_workers=args.workers, backend=args.backend, instrument=args.instrument)
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+
+# Adaptive time grids for figure- and fit-quality curves.
+#
+# A coarse uniform grid is refined by interval bisection: the midpoint of every
+# candidate interval is simulated (all midpoints of one level in a single call) and
+# compared with the PCHIP interpolant of the points known so far. Intervals where the
+# interpolant misses by more than the tolerance are split and checked again, so points
+# gather around the breakthrough peak and pulse-end kinks while the tail stays coarse.
+
+def adaptive_time_grid(
+        simulate,
+        t_start,
+        t_end,
+        rtol=1e-3,
+        atol=0.0,
+        n_initial=17,
+        max_points=2000,
+        min_spacing=None):
+    """
+    simulate    : callable mapping a sorted 1-D array of times to concentrations,
+                  e.g. lambda t: simulateSinglePorosity(..., time_points=t, ...)
+    t_start     : first time (> 0 for the numerical inversion engines)
+    t_end       : last time
+    rtol, atol  : interpolation tolerance atol + rtol * (max - min of the curve)
+    n_initial   : points of the starting uniform grid
+    max_points  : refinement stops once the grid holds this many points
+    min_spacing : intervals narrower than this are not split (default (t_end - t_start) * 1e-6)
+
+    returns: time points, concentrations and a PchipInterpolator through them
+    """
+    if min_spacing is None:
+        min_spacing = (t_end - t_start) * 1e-6
+    t = np.linspace(t_start, t_end, n_initial)
+    c = np.asarray(simulate(t), dtype=np.float64)
+    # every interval of the starting grid is a candidate for refinement
+    candidates = np.ones(len(t) - 1, dtype=bool)
+
+    while np.any(candidates) and len(t) < max_points:
+        left = np.flatnonzero(candidates)
+        left = left[(t[left + 1] - t[left]) > 2 * min_spacing][:max_points - len(t)]
+        if len(left) == 0:
+            break
+        t_mid = (t[left] + t[left + 1]) / 2
+        c_mid = np.asarray(simulate(t_mid), dtype=np.float64)
+
+        tol = atol + rtol * np.ptp(c)
+        failed = np.abs(PchipInterpolator(t, c)(t_mid) - c_mid) > tol
+
+        # insert the midpoints; the two halves of a failed interval become candidates
+        position = np.searchsorted(t, t_mid)
+        t = np.insert(t, position, t_mid)
+        c = np.insert(c, position, c_mid)
+        new_positions = position + np.arange(len(position))
+        candidates = np.zeros(len(t) - 1, dtype=bool)
+        candidates[new_positions[failed] - 1] = True
+        candidates[new_positions[failed]] = True
+
+    return t, c, PchipInterpolator(t, c)